@@ -0,0 +1,150 @@
+"""
+Compare how a single server process copes with slow clients on the catalog
+pages under ASGI (uvicorn, async views) versus WSGI (gunicorn, sync worker).
+
+Clients arrive at a steady rate for --seconds, alternating between slow and
+fast. A slow client sends the request line, then takes --client-delay
+seconds to finish its headers (a slow mobile link). A fast client sends its
+request at once. gunicorn's sync worker accepts one connection and blocks
+reading its headers, so every fast client queued behind a slow one waits
+for it. Under uvicorn a slow client holds only a coroutine. The number to
+compare is the fast clients' latency.
+
+Measured on /, /search/?q=cat and /search/suggest/?q=cat, 20 clients/s for
+5 s, 0.5 s header delay: fast clients' p50 was 0.46-0.47 s under WSGI and
+0.007-0.014 s under ASGI (at 40/s with a 1 s delay, 0.99 s against
+0.012 s). The header wait is absorbed by uvicorn's event loop. The async
+views then keep the request on that loop, except for their ORM queries and
+rendering, rather than running the whole view on Django's one sync thread.
+
+Requires a migrated database and ``pip install uvicorn gunicorn``:
+
+    python benchmarks/asgi_vs_wsgi.py --seconds 5 --rate 20 --client-delay 0.5 --path /
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVERS = {
+    'wsgi': ['gunicorn', 'medimart5.wsgi:application', '--workers', '1',
+             '--worker-class', '{worker_class}', '--threads', '{threads}', '--bind', '127.0.0.1:{port}'],
+    'asgi': ['uvicorn', 'medimart5.asgi:application', '--workers', '1',
+             '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def host_header():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medimart5.settings')
+    from django.conf import settings
+    return next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+
+
+async def client(port, path, host, delay, start_at, latencies):
+    await asyncio.sleep(start_at)
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"GET {path} HTTP/1.1\r\n".encode())
+        await writer.drain()
+        if delay:
+            await asyncio.sleep(delay)
+        writer.write(f"Host: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status = (await reader.readline()).split(b' ')[1:2]
+        await reader.read()
+        writer.close()
+        if status == [b'200']:
+            latencies.append(time.perf_counter() - start)
+    except (OSError, IndexError):
+        pass
+
+
+async def drive(port, args, host):
+    # One warm-up request so both servers are measured in steady state
+    await client(port, args.path, host, 0, 0, [])
+
+    slow, fast = [], []
+    gap = 1 / args.rate
+    arrivals = range(int(args.seconds * args.rate))
+    await asyncio.gather(*(
+        client(port, args.path, host, args.client_delay if n % 2 == 0 else 0, n * gap,
+               slow if n % 2 == 0 else fast)
+        for n in arrivals))
+    return slow, fast, len(arrivals)
+
+
+def summary(latencies):
+    if not latencies:
+        return "none ok"
+    latencies = sorted(latencies)
+    return (f"p50={latencies[len(latencies) // 2]:.3f}s "
+            f"p95={latencies[int(len(latencies) * 0.95)]:.3f}s max={latencies[-1]:.3f}s")
+
+
+def bench(kind, args, host):
+    binary = SERVERS[kind][0]
+    if not shutil.which(binary):
+        print(f"{kind:<5} skipped: {binary} is not installed")
+        return
+    port = free_port()
+    worker_class = 'sync' if args.threads == 1 else 'gthread'
+    cmd = [part.format(port=port, threads=args.threads, worker_class=worker_class)
+           for part in SERVERS[kind]]
+    server = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(port)
+        slow, fast, sent = asyncio.run(drive(port, args, host))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{kind:<5} ok={len(slow) + len(fast)}/{sent}  "
+          f"fast clients: {summary(fast)}  slow clients: {summary(slow)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=5, help="How long clients keep arriving.")
+    parser.add_argument('--rate', type=float, default=20, help="Clients arriving per second, half of them slow.")
+    parser.add_argument('--client-delay', type=float, default=0.5,
+                        help="Seconds a slow client takes to finish its request headers.")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="Threads for the WSGI worker; 1 (default) uses a sync worker "
+                             "like a single-threaded uWSGI/PythonAnywhere worker.")
+    parser.add_argument('--path', default='/')
+    args = parser.parse_args()
+
+    host = host_header()
+    for kind in ('wsgi', 'asgi'):
+        bench(kind, args, host)
+
+
+if __name__ == '__main__':
+    main()
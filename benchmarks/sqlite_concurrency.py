@@ -0,0 +1,123 @@
+"""
+Compare SQLite write/read concurrency with the stock settings against the
+production profile in medimart5/settings.py (WAL, busy_timeout,
+synchronous=NORMAL, mmap/cache, IMMEDIATE write transactions).
+
+Simulates checkout-style writers (insert order + items in one transaction)
+alongside catalog readers on a scratch database file.
+
+    python benchmarks/sqlite_concurrency.py --writers 4 --readers 8 --seconds 5
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_PRAGMAS = {}
+TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+}
+
+
+def connect(path, pragmas, timeout):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def setup(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total REAL);
+        CREATE TABLE order_item (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, qty INTEGER);
+    """)
+    conn.executemany("INSERT INTO product (name, price) VALUES (?, ?)",
+                     [(f"product-{i}", i % 50 + 1.0) for i in range(5000)])
+    conn.commit()
+    conn.close()
+
+
+def run(profile, pragmas, begin, args):
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    os.unlink(path)
+    setup(path)
+
+    counts = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def writer(n):
+        conn = connect(path, pragmas, args.timeout)
+        while time.perf_counter() < stop:
+            try:
+                conn.execute(begin)
+                cur = conn.execute("INSERT INTO orders (user_id, total) VALUES (?, ?)", (n, 10.0))
+                conn.executemany(
+                    "INSERT INTO order_item (order_id, product_id, qty) VALUES (?, ?, 1)",
+                    [(cur.lastrowid, (n * 7 + k) % 5000 + 1) for k in range(3)],
+                )
+                conn.execute("COMMIT")
+                with lock:
+                    counts['writes'] += 1
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                with lock:
+                    counts['locked'] += 1
+        conn.close()
+
+    def reader(n):
+        conn = connect(path, pragmas, args.timeout)
+        while time.perf_counter() < stop:
+            try:
+                conn.execute("SELECT id, name, price FROM product WHERE price > ? LIMIT 50", (n % 40,)).fetchall()
+                conn.execute("SELECT COUNT(*) FROM orders").fetchone()
+                with lock:
+                    counts['reads'] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['locked'] += 1
+        conn.close()
+
+    threads = ([threading.Thread(target=writer, args=(i,)) for i in range(args.writers)] +
+               [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)])
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+    print(f"{profile:<10} writes/s={counts['writes'] / args.seconds:>9.1f} "
+          f"reads/s={counts['reads'] / args.seconds:>9.1f} "
+          f"lock errors={counts['locked']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--timeout', type=float, default=0.1,
+                        help="sqlite3 connect timeout for the default profile (seconds).")
+    args = parser.parse_args()
+
+    run('default', DEFAULT_PRAGMAS, 'BEGIN', args)
+    run('tuned', TUNED_PRAGMAS, 'BEGIN IMMEDIATE', args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Compare order throughput on one hot SKU: updating the stock column in place
+against appending to the stock ledger (main/stock.py).
+
+Both modes re-check availability the way stock.consume() does: the stock
+column plus uncompacted movements, minus other carts' holds.
+
+    hot-row   BEGIN IMMEDIATE; check; UPDATE product SET stock = stock - 1;
+              delete hold; insert order; COMMIT
+    ledger    BEGIN IMMEDIATE; check; insert sale movement; delete hold;
+              insert order; COMMIT
+
+Both run against a scratch SQLite file with the production PRAGMAs. A
+compactor thread folds the ledger into the stock column every --compact-every
+seconds, the same way manage.py compact_stock_ledger does.
+
+    python benchmarks/stock_ledger.py --writers 8 --seconds 5
+
+Measured with 8 writers for 4 s: hot-row about 22k orders/s, ledger about
+1.6k (2.5k when compacting every 0.1 s). The ledger's check sums every
+uncompacted movement of the SKU, so it slows down as they pile up.
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+}
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def setup(path, stock):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, stock INTEGER CHECK (stock >= 0));
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total REAL);
+        CREATE TABLE hold (id INTEGER PRIMARY KEY, cart_id INTEGER, sku_id INTEGER, quantity INTEGER);
+        CREATE TABLE movement (id INTEGER PRIMARY KEY, sku_id INTEGER, quantity INTEGER,
+                               order_id INTEGER, compacted INTEGER DEFAULT 0);
+        CREATE INDEX movement_pending ON movement (sku_id) WHERE compacted = 0;
+        CREATE INDEX hold_sku ON hold (sku_id);
+    """)
+    conn.executemany("INSERT INTO product (name, stock) VALUES (?, ?)",
+                     [(f"product-{i}", stock) for i in range(100)])
+    conn.commit()
+    conn.close()
+
+
+def available(conn, cart_id):
+    (stock,) = conn.execute("SELECT stock FROM product WHERE id = 1").fetchone()
+    (pending,) = conn.execute(
+        "SELECT COALESCE(SUM(quantity), 0) FROM movement WHERE sku_id = 1 AND compacted = 0").fetchone()
+    (held,) = conn.execute(
+        "SELECT COALESCE(SUM(quantity), 0) FROM hold WHERE sku_id = 1 AND cart_id != ?", (cart_id,)).fetchone()
+    return stock + pending - held
+
+
+def hot_row(conn, n):
+    conn.execute("BEGIN IMMEDIATE")
+    if available(conn, n) < 1:
+        conn.execute("ROLLBACK")
+        return False
+    conn.execute("UPDATE product SET stock = stock - 1 WHERE id = 1")
+    conn.execute("DELETE FROM hold WHERE cart_id = ?", (n,))
+    conn.execute("INSERT INTO orders (user_id, total) VALUES (?, 10.0)", (n,))
+    conn.execute("COMMIT")
+    return True
+
+
+def ledger(conn, n):
+    conn.execute("BEGIN IMMEDIATE")
+    if available(conn, n) < 1:
+        conn.execute("ROLLBACK")
+        return False
+    cur = conn.execute("INSERT INTO orders (user_id, total) VALUES (?, 10.0)", (n,))
+    conn.execute("INSERT INTO movement (sku_id, quantity, order_id) VALUES (1, -1, ?)", (cur.lastrowid,))
+    conn.execute("DELETE FROM hold WHERE cart_id = ?", (n,))
+    conn.execute("COMMIT")
+    return True
+
+
+def compact(conn, batch_size=5000):
+    """Fold pending movements into product.stock until none are left."""
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM movement WHERE compacted = 0 ORDER BY id LIMIT ?", (batch_size,))]
+        if ids:
+            marks = ','.join('?' * len(ids))
+            for sku_id, delta in conn.execute(
+                    f"SELECT sku_id, SUM(quantity) FROM movement WHERE id IN ({marks}) GROUP BY sku_id", ids).fetchall():
+                conn.execute("UPDATE product SET stock = stock + ? WHERE id = ?", (delta, sku_id))
+            conn.execute(f"UPDATE movement SET compacted = 1 WHERE id IN ({marks})", ids)
+        conn.execute("COMMIT")
+        if len(ids) < batch_size:
+            return
+
+
+def run(mode, args):
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    os.unlink(path)
+    setup(path, args.stock)
+
+    place = hot_row if mode == 'hot-row' else ledger
+    counts = {'orders': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def writer(n):
+        conn = connect(path)
+        while time.perf_counter() < stop:
+            try:
+                placed = place(conn, n)
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                placed = False
+                with lock:
+                    counts['errors'] += 1
+            if placed:
+                with lock:
+                    counts['orders'] += 1
+        conn.close()
+
+    def compactor():
+        conn = connect(path)
+        while time.perf_counter() < stop:
+            time.sleep(args.compact_every)
+            compact(conn)
+        conn.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    if mode == 'ledger':
+        threads.append(threading.Thread(target=compactor))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = connect(path)
+    compact(conn)  # whatever the writers committed after the compactor's last pass
+    (stock,) = conn.execute("SELECT stock FROM product WHERE id = 1").fetchone()
+    conn.close()
+    os.unlink(path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+    consistent = stock == args.stock - counts['orders']
+    print(f"{mode:<8} {counts['orders'] / args.seconds:>9.0f} orders/s  "
+          f"errors={counts['errors']}  final stock={stock} ({'consistent' if consistent else 'MISMATCH'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--stock', type=int, default=10_000_000)
+    parser.add_argument('--compact-every', type=float, default=1.0)
+    args = parser.parse_args()
+
+    for mode in ('hot-row', 'ledger'):
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,7 @@ class CategoryAdmin(admin.ModelAdmin):
 # -----------------------
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'category', 'price')
+    list_display = ('id', 'name', 'category', 'price', 'stock')
     search_fields = ('name', 'description')
     list_filter = ('category',)
 
@@ -59,6 +59,7 @@ class AppointmentInline(admin.TabularInline):
 
 class PrescriptionInline(admin.TabularInline):
     model = Prescription
+    fk_name = 'doctor'
     extra = 0
     readonly_fields = ('patient', 'uploaded_at', 'status')
 
@@ -87,7 +88,7 @@ class AppointmentAdmin(admin.ModelAdmin):
 # -----------------------
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'patient', 'doctor', 'status', 'uploaded_at')
+    list_display = ('id', 'patient', 'doctor', 'status', 'uploaded_at', 'claimed_by', 'lease_expires_at')
     search_fields = ('patient__username', 'doctor__name')
     list_filter = ('status', 'uploaded_at')
 
@@ -109,7 +110,7 @@ from .models import PetCategory, PetProduct
 class PetProductInline(admin.TabularInline):
     model = PetProduct
     extra = 1  # how many empty product forms to show
-    fields = ('name', 'price', 'prescription_required', 'image')
+    fields = ('name', 'price', 'stock', 'prescription_required', 'image')
     show_change_link = True
 
 # Category admin with products inline
@@ -121,7 +122,7 @@ class PetCategoryAdmin(admin.ModelAdmin):
 # Product admin (still separate if needed)
 @admin.register(PetProduct)
 class PetProductAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "category", "price", "prescription_required")
+    list_display = ("id", "name", "category", "price", "stock", "prescription_required")
     list_filter = ("category", "prescription_required")
     search_fields = ("name",)
 
@@ -136,3 +137,69 @@ class eLabScheduleAdmin(admin.ModelAdmin):
     list_filter = ('test_type', 'report_verified')
     search_fields = ('user__username', 'test_name')
     readonly_fields = ('user', 'test_type', 'test_name', 'test_price', 'preferred_date', 'preferred_time', 'address', 'phone')
+
+
+from .models import Sku
+
+
+@admin.register(Sku)
+class SkuAdmin(admin.ModelAdmin):
+    list_display = ('code', 'kind', 'product', 'pet_product')
+    list_filter = ('kind',)
+    search_fields = ('code', 'product__name', 'pet_product__name')
+    readonly_fields = ('code', 'kind', 'product', 'pet_product')
+
+
+from .models import ArchivedOrder, ArchivedOrderItem
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('sku_code', 'name', 'quantity', 'price')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'created_at', 'status', 'total_price', 'archived_at')
+    list_filter = ('status', 'payment_method')
+    search_fields = ('user__username', 'user__email')
+    inlines = [ArchivedOrderItemInline]
+
+
+from .models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'kind', 'subject', 'created_at', 'sent_at', 'attempts')
+    list_filter = ('kind', ('sent_at', admin.EmptyFieldListFilter))
+    search_fields = ('recipient__username', 'recipient__email', 'subject')
+    readonly_fields = ('created_at',)
+
+
+from . import stock
+from .models import StockMovement
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """
+    Receipts, returns and adjustments are added here; the ledger is
+    append-only. StockMovement.clean() checks each kind's sign.
+    """
+    list_display = ('created_at', 'sku', 'kind', 'quantity', 'order', 'note', 'compacted')
+    list_filter = ('kind', 'compacted')
+    search_fields = ('sku__code', 'note')
+    raw_id_fields = ('sku', 'order')
+    fields = ('sku', 'kind', 'quantity', 'note')
+
+    def save_model(self, request, obj, form, change):
+        stock.save_movement(obj)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,75 @@
+# main/analytics.py
+"""
+Staff sales figures read from the daily rollups.
+
+manage.py build_sales_rollups keeps DailySales and DailyItemSales up to
+date, so a summary is a handful of GROUP BYs over at most a few rows per
+day, never a scan of the order tables. Each summary is cached under the
+'sales' model version, which the rollup command bumps after every run.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .cache import FRAGMENT_TIMEOUT, model_version
+from .models import DailyItemSales, DailySales, RollupWatermark
+
+RANGES = (7, 30, 90, 365, 0)  # 0 = all time
+TOP_PRODUCTS = 10
+SUMMARY_KEY = 'sales:summary:{}:{}'
+
+
+def _with_share(rows, total):
+    for row in rows:
+        row['share'] = round(float(row['revenue'] / total * 100), 1) if total else 0
+    return rows
+
+
+def sales_summary(days):
+    """Revenue breakdowns for the last ``days`` days (0 for all time)."""
+    key = SUMMARY_KEY.format(days, model_version('sales'))
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    sales, items = DailySales.objects.all(), DailyItemSales.objects.all()
+    if days:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        sales, items = sales.filter(day__gte=since), items.filter(day__gte=since)
+
+    totals = sales.aggregate(orders=Sum('orders'), revenue=Sum('revenue'))
+    orders, revenue = totals['orders'] or 0, totals['revenue'] or Decimal('0.00')
+    item_revenue = items.aggregate(revenue=Sum('revenue'))['revenue'] or Decimal('0.00')
+
+    by_day = list(sales.values('day').annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+                  .order_by('day'))
+    peak = max((row['revenue'] for row in by_day), default=0)
+    for row in by_day:
+        row['bar'] = round(float(row['revenue'] / peak * 100)) if peak else 0
+
+    summary = {
+        'orders': orders,
+        'revenue': revenue,
+        'average_order': (revenue / orders).quantize(Decimal('0.01')) if orders else Decimal('0.00'),
+        'by_day': by_day,
+        'by_payment': _with_share(list(
+            sales.values('payment_method').annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+            .order_by('-revenue')), revenue),
+        'by_category': _with_share(list(
+            items.values('category').annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-revenue')), item_revenue),
+        'by_prescription': _with_share(list(
+            items.values('prescription').annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-prescription')), item_revenue),
+        'top_products': list(
+            items.values('sku_code').annotate(name=Max('name'), quantity=Sum('quantity'),
+                                              revenue=Sum('revenue'))
+            .order_by('-revenue')[:TOP_PRODUCTS]),
+        'refreshed': RollupWatermark.objects.filter(name='sales').values_list('value', flat=True).first(),
+    }
+    cache.set(key, summary, FRAGMENT_TIMEOUT)
+    return summary
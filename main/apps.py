@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'main'
\ No newline at end of file
+    name = 'main'
+
+    def ready(self):
+        from . import signals  # noqa: F401
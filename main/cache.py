@@ -0,0 +1,52 @@
+# main/cache.py
+"""
+Model version counters for template fragment caching.
+
+Each cached fragment includes the version of the models it renders in its
+key (``{% cache 3600 name cache_versions.category %}``). Saving or deleting
+a row bumps that model's counter (see signals.py), so old fragments are
+never served again and simply expire.
+"""
+
+import time
+
+from django.core.cache import cache
+
+FRAGMENT_TIMEOUT = 3600
+VERSION_KEY = 'modelversion:{}'
+
+
+def model_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a cache flush cannot resurrect old fragments
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_model_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def versions_after_own_bump(seen, names, name):
+    """
+    Counters for ``names`` after this process bumped ``name`` once. Returns
+    None if anything else moved since ``seen``: another worker changed
+    something, so an in-process copy should be rebuilt.
+    """
+    expected = tuple(version + (n == name) for version, n in zip(seen, names))
+    current = tuple(model_version(n) for n in names)
+    return current if current == expected else None
+
+
+class ModelVersions:
+    """Lazy ``{{ cache_versions.<name> }}`` lookup for templates."""
+
+    def __getitem__(self, name):
+        return model_version(name)
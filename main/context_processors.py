@@ -1,11 +1,12 @@
 # main/context_processors.py
 
-from .models import Cart
+from .cache import FRAGMENT_TIMEOUT, ModelVersions
+from .models import CartItem
 
 def cart_count(request):
     if request.user.is_authenticated:
-        cart = Cart.objects.filter(user=request.user).first()
-        count = cart.items.count() if cart and hasattr(cart, 'items') else 0
+        # Single query through the unique cart.user index
+        count = CartItem.objects.filter(cart__user=request.user).count()
     else:
         cart_session = request.session.get('cart', {})
         count = sum(cart_session.values()) if isinstance(cart_session, dict) else 0
@@ -40,3 +41,12 @@ def user_group_flags(request):
         'is_patient': is_patient,
         'is_staff': is_staff,
     }
+
+
+def fragment_cache(request):
+    """Keys for the {% cache %} fragments in base.html and listing pages."""
+    return {
+        'cache_versions': ModelVersions(),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'in_pet_care': request.path.startswith('/pet-care'),
+    }
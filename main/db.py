@@ -0,0 +1,76 @@
+# main/db.py
+"""
+Database helpers for the production SQLite profile: per-connection PRAGMA
+tuning and an optional read-replica router for catalog pages.
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+
+# Only catalog/directory tables are served from the replica. Carts, orders,
+# sessions and auth always read from the primary so users see their own writes.
+REPLICA_MODELS = {
+    'main.category', 'main.product', 'main.petcategory', 'main.petproduct',
+    'main.sku', 'main.skuneighbours', 'main.doctor', 'main.schedule',
+}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created handler applying the alias' PRAGMAS setting."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def read_replica(view):
+    """Mark a read-only view so its catalog queries may use the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def _wrapped(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view)
+        def _wrapped(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return _wrapped
+
+
+class ReadReplicaRouter:
+    """
+    Sends catalog reads made inside ``@read_replica`` views to the
+    ``replica`` alias when it is configured; everything else uses default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (_replica_reads.get()
+                and REPLICA_ALIAS in connections.databases
+                and model._meta.label_lower in REPLICA_MODELS):
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
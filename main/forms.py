@@ -7,6 +7,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Prescription, Appointment
+from .uploads import SafeFileField, SafeImageField
 
 
 class SignupForm(UserCreationForm):
@@ -38,6 +39,7 @@ class PrescriptionForm(forms.ModelForm):
     class Meta:
         model = Prescription
         fields = ['image']
+        field_classes = {'image': SafeImageField}
 
 
 # forms.py
@@ -45,6 +47,7 @@ class AppointmentPrescriptionForm(forms.ModelForm):
     class Meta:
         model = Appointment
         fields = ['prescription_file']
+        field_classes = {'prescription_file': SafeFileField}
         widgets = {
             'prescription_file': forms.ClearableFileInput(attrs={'class': 'form-control'}),
         }
@@ -121,6 +124,7 @@ class eLabReportUploadForm(forms.ModelForm):
     class Meta:
         model = eLabSchedule
         fields = ['report_file', 'report_verified']
+        field_classes = {'report_file': SafeFileField}
         widgets = {
             'report_verified': forms.CheckboxInput(attrs={'style':'transform:scale(1.2);'}),
         }
@@ -0,0 +1,172 @@
+# main/fuzzy.py
+"""
+Typo-tolerant product search over an in-memory trigram index.
+
+Every distinct word in a Product or PetProduct name is split into
+trigrams, pg_trgm style (padded "  w", " wo", "wor", "ord", "rd "). Two
+words are similar when the Jaccard overlap of their trigram sets reaches
+SIMILARITY_THRESHOLD, which lets "paracitamol" find "paracetamol".
+
+Candidate words come from the query's rarest trigrams only. A word
+reaching the threshold must share at least one of the query's
+``n - ceil(t * n) + 1`` rarest trigrams, so a lookup reads a few short
+posting lists rather than the whole vocabulary.
+
+The index is kept current the same way as main/suggest.py. It is built on
+first use, changes in this process are applied on commit, and other
+workers rebuild when the model version counters move.
+"""
+
+import math
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from .cache import model_version, versions_after_own_bump
+from .models import PetProduct, Product
+from .suggest import normalize
+
+SOURCES = ('product', 'petproduct')
+SIMILARITY_THRESHOLD = 0.3
+MATCHES_PER_WORD = 5
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class TrigramIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._items = {}                    # (kind, pk) -> words
+        self._word_items = defaultdict(set)  # word -> {(kind, pk)}
+        self._word_grams = {}               # word -> trigram set
+        self._postings = defaultdict(set)   # trigram -> {word}
+        self._versions = None
+
+    def rebuild(self):
+        # Loaded into a fresh index and swapped in, like PrefixIndex.rebuild()
+        versions = self._current_versions()
+        fresh = TrigramIndex()
+        for pk, name in Product.objects.values_list('pk', 'name'):
+            fresh._put(('product', pk), name)
+        for pk, name in PetProduct.objects.values_list('pk', 'name'):
+            fresh._put(('petproduct', pk), name)
+        with self._lock:
+            self._items, self._word_items = fresh._items, fresh._word_items
+            self._word_grams, self._postings = fresh._word_grams, fresh._postings
+            self._versions = versions
+
+    def _current_versions(self):
+        return tuple(model_version(name) for name in SOURCES)
+
+    def _put(self, item, name):
+        self._drop(item)
+        words = frozenset(normalize(name).split())
+        self._items[item] = words
+        for word in words:
+            if not self._word_items[word]:
+                grams = trigrams(word)
+                self._word_grams[word] = grams
+                for gram in grams:
+                    self._postings[gram].add(word)
+            self._word_items[word].add(item)
+
+    def _drop(self, item):
+        for word in self._items.pop(item, ()):
+            self._word_items[word].discard(item)
+            if not self._word_items[word]:
+                del self._word_items[word]
+                for gram in self._word_grams.pop(word):
+                    self._postings[gram].discard(word)
+                    if not self._postings[gram]:
+                        del self._postings[gram]
+
+    @staticmethod
+    def _item(instance):
+        if isinstance(instance, Product):
+            return ('product', instance.pk)
+        if isinstance(instance, PetProduct):
+            return ('petproduct', instance.pk)
+        return None
+
+    def saved(self, instance):
+        item = self._item(instance)
+        with self._lock:
+            if item is None or self._versions is None:
+                return
+            self._put(item, instance.name)
+            self._versions = versions_after_own_bump(self._versions, SOURCES, item[0])
+
+    def deleted(self, instance):
+        item = self._item(instance)
+        with self._lock:
+            if item is None or self._versions is None:
+                return
+            self._drop(item)
+            self._versions = versions_after_own_bump(self._versions, SOURCES, item[0])
+
+    def _similar_words(self, word):
+        """[(similarity, word)] best first, for vocabulary words near ``word``."""
+        if word in self._word_items:
+            return [(1.0, word)]
+        grams = trigrams(word)
+        rare = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        needed = len(grams) - math.ceil(SIMILARITY_THRESHOLD * len(grams)) + 1
+        candidates = set()
+        for gram in rare[:needed]:
+            candidates |= self._postings.get(gram, set())
+        scored = [(similarity(grams, self._word_grams[w]), w) for w in candidates]
+        scored = [pair for pair in scored if pair[0] >= SIMILARITY_THRESHOLD]
+        scored.sort(key=lambda pair: (-pair[0], -len(self._word_items[pair[1]]), pair[1]))
+        return scored[:MATCHES_PER_WORD]
+
+    def search(self, query, limit=20):
+        """
+        (did_you_mean, [(kind, pk, score), ...]) best first. ``did_you_mean``
+        is the query with each word replaced by its closest catalog word, or
+        None when the query already uses catalog words only.
+        """
+        words = normalize(query).split()
+        if not words:
+            return None, []
+        if self._versions != self._current_versions():
+            self.rebuild()
+        return self._lookup(words, limit)
+
+    async def asearch(self, query, limit=20):
+        """search() for async views; only a rebuild runs in a worker thread."""
+        words = normalize(query).split()
+        if not words:
+            return None, []
+        if self._versions != self._current_versions():
+            await sync_to_async(self.rebuild)()
+        return self._lookup(words, limit)
+
+    def _lookup(self, words, limit):
+        with self._lock:
+            scores = defaultdict(float)
+            corrected = []
+            for word in words:
+                matches = self._similar_words(word)
+                corrected.append(matches[0][1] if matches else word)
+                best = {}
+                for sim, match in matches:
+                    for item in self._word_items[match]:
+                        best[item] = max(best.get(item, 0.0), sim)
+                for item, sim in best.items():
+                    scores[item] += sim / len(words)
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+        suggestion = ' '.join(corrected)
+        return (suggestion if suggestion != ' '.join(words) else None,
+                [(kind, pk, round(score, 3)) for (kind, pk), score in ranked])
+
+
+index = TrigramIndex()
@@ -0,0 +1,152 @@
+# main/ical.py
+"""
+iCalendar (RFC 5545) feeds of a user's appointments and eLab bookings.
+
+Doctors get their patients' appointments. Patients get their own
+appointments and eLab home-collection visits. The rows are streamed from
+the database one chunk at a time, so a long history never sits in memory.
+The ETag comes from the row count and the newest ``updated_at``, so a
+calendar app polling an unchanged feed costs one aggregate query.
+
+Appointment times are stored without a zone, so events are written as
+"floating" local times, which calendar apps show at the booked wall-clock time.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Count, Max
+
+from .models import Appointment, eLabSchedule
+
+APPOINTMENT_MINUTES = 30
+ELAB_VISIT_MINUTES = 30
+CHUNK_SIZE = 200
+# Bump when the event layout changes so clients refetch
+FEED_VERSION = 1
+
+PRODID = '-//MediMart//Appointments//EN'
+
+
+def _escape(value):
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Fold a content line to 75 octets per RFC 5545 section 3.1."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split inside a multi-byte character
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _utc(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(uid, start, minutes, summary, stamp, description='', location='', url='', cancelled=False):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_utc(stamp)}',
+        f'DTSTART:{_local(start)}',
+        f'DTEND:{_local(start + timedelta(minutes=minutes))}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    if location:
+        lines.append(f'LOCATION:{_escape(location)}')
+    if url:
+        lines.append(f'URL:{url}')
+    lines.append(f"STATUS:{'CANCELLED' if cancelled else 'CONFIRMED'}")
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _appointment_event(appointment, for_doctor):
+    if for_doctor:
+        patient = appointment.patient_name or (appointment.patient and appointment.patient.username) or 'Guest'
+        summary = f"Appointment: {patient}"
+        location = ''
+    else:
+        summary = f"Appointment with {appointment.doctor.name}"
+        location = appointment.doctor.location
+    return _event(
+        uid=f'appointment-{appointment.pk}@medimart',
+        start=datetime.combine(appointment.date, appointment.time),
+        minutes=APPOINTMENT_MINUTES,
+        summary=summary,
+        stamp=appointment.updated_at,
+        description=f"{appointment.get_visit_type_display()} visit\n{appointment.notes}".strip(),
+        location=location if appointment.visit_type != 'online' else appointment.meeting_link,
+        url=appointment.meeting_link if appointment.visit_type == 'online' else '',
+        cancelled=appointment.status.lower() == 'cancelled',
+    )
+
+
+def _elab_event(booking):
+    return _event(
+        uid=f'elab-{booking.pk}@medimart',
+        start=datetime.combine(booking.preferred_date, booking.preferred_time),
+        minutes=ELAB_VISIT_MINUTES,
+        summary=f"eLab sample collection: {booking.test_name}",
+        stamp=booking.updated_at,
+        description=f"{booking.test_type} test",
+        location=booking.address,
+    )
+
+
+def feed_querysets(user):
+    """(queryset, to_event) pairs making up ``user``'s feed."""
+    doctor = getattr(user, 'doctor_profile', None)
+    if doctor is not None:
+        appointments = (Appointment.objects.filter(doctor=doctor)
+                        .select_related('patient').order_by('date', 'time'))
+        return [(appointments, lambda a: _appointment_event(a, for_doctor=True))]
+
+    appointments = (Appointment.objects.filter(patient=user)
+                    .select_related('doctor').order_by('date', 'time'))
+    bookings = eLabSchedule.objects.filter(user=user).order_by('preferred_date', 'preferred_time')
+    return [
+        (appointments, lambda a: _appointment_event(a, for_doctor=False)),
+        (bookings, _elab_event),
+    ]
+
+
+def feed_etag(querysets):
+    """Unquoted ETag: changes on any insert, update or delete in the feed."""
+    parts = [str(FEED_VERSION)]
+    for queryset, _ in querysets:
+        state = queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+        parts.append(f"{state['count']}:{state['latest'].timestamp() if state['latest'] else 0}")
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def stream_feed(querysets, name):
+    """Yield the calendar one event at a time."""
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ))
+    for queryset, to_event in querysets:
+        for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield to_event(row)
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,160 @@
+# main/lab_reports.py
+"""
+Bulk import of eLab report PDFs from a ZIP archive.
+
+Each PDF is matched to its booking by the ID in its file name ("123.pdf",
+"elab-123.pdf" or "123_cbc.pdf"). The archive is checked first: names,
+known booking IDs, sizes, the PDF signature and that every member
+decompresses with a matching CRC (encrypted, truncated or corrupt members
+are problems too). If anything is wrong, nothing is written and every
+problem is reported at once. Otherwise every report is streamed from the
+archive into upload storage and attached in one transaction, with its
+notification; if that transaction rolls back, the files it stored are
+deleted again. The upload handler has already spooled a large archive to
+a temporary file, and members are decompressed chunk by chunk, so no
+report is ever held in memory whole.
+"""
+
+import re
+import zipfile
+import zlib
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from . import notifications
+from .models import eLabSchedule
+from .storage import content_digest
+from .uploads import RejectedUpload
+
+REPORT_NAME_RE = re.compile(r'^(?:elab[-_ ]?)?(?P<id>\d+)(?:[-_ ][^/]*)?\.pdf$', re.IGNORECASE)
+PDF_SIGNATURE = b'%PDF-'
+READ_CHUNK_BYTES = 64 * 1024
+
+# What reading a member can raise: BadZipFile for a bad CRC or header,
+# RuntimeError for an encrypted member, NotImplementedError for an unknown
+# compression method, EOFError/OSError/zlib.error for a truncated or
+# corrupt stream.
+MEMBER_READ_ERRORS = (zipfile.BadZipFile, RuntimeError, NotImplementedError,
+                      EOFError, OSError, zlib.error)
+
+
+class ReportArchiveError(Exception):
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__('; '.join(problems))
+
+
+def _members(archive):
+    """(booking id, ZipInfo) for each PDF in the archive, or ReportArchiveError."""
+    problems, members, seen = [], [], {}
+    for info in archive.infolist():
+        path = PurePosixPath(info.filename)
+        if info.is_dir() or '__MACOSX' in path.parts or path.name.startswith('.'):
+            continue
+        match = REPORT_NAME_RE.match(path.name)
+        if not match:
+            problems.append(f"{info.filename}: name must be <booking id>.pdf")
+            continue
+        booking_id = int(match.group('id'))
+        if booking_id in seen:
+            problems.append(f"{info.filename}: booking {booking_id} already has {seen[booking_id]} in this archive")
+            continue
+        seen[booking_id] = info.filename
+        if info.file_size > settings.ELAB_REPORT_MAX_BYTES:
+            problems.append(f"{info.filename}: larger than {settings.ELAB_REPORT_MAX_BYTES // (1024 * 1024)} MB")
+            continue
+        problem = _read_problem(archive, info)
+        if problem:
+            problems.append(f"{info.filename}: {problem}")
+            continue
+        members.append((booking_id, info))
+
+    known = set(eLabSchedule.objects.filter(pk__in=[booking_id for booking_id, _ in members])
+                .values_list('pk', flat=True))
+    problems += [f"{info.filename}: no such booking" for booking_id, info in members if booking_id not in known]
+
+    if len(members) > settings.ELAB_BULK_MAX_REPORTS:
+        problems.append(f"{len(members)} reports; upload at most {settings.ELAB_BULK_MAX_REPORTS} at a time")
+    if not members and not problems:
+        problems.append("The archive contains no PDF reports.")
+    if problems:
+        raise ReportArchiveError(problems)
+    return members
+
+
+def _read_problem(archive, info):
+    """Why ``info`` is not a readable PDF, or None. Reads it to the end, so the CRC is checked."""
+    try:
+        with archive.open(info) as stream:
+            if stream.read(len(PDF_SIGNATURE)) != PDF_SIGNATURE:
+                return "not a PDF"
+            while stream.read(READ_CHUNK_BYTES):
+                pass
+    except MEMBER_READ_ERRORS as exc:
+        return _describe(exc)
+    return None
+
+
+def _describe(exc):
+    if isinstance(exc, RuntimeError):
+        return "encrypted; zip it again without a password"
+    return f"damaged or truncated ({exc})"
+
+
+def import_reports(upload, verify=False):
+    """
+    Attach every report in the ZIP ``upload`` to its booking. Returns the
+    updated bookings; raises ReportArchiveError without writing anything if
+    the archive has problems.
+    """
+    if isinstance(upload, RejectedUpload):
+        raise ReportArchiveError([upload.error])
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise ReportArchiveError(["The file is not a ZIP archive."])
+
+    with archive:
+        members = _members(archive)
+        stored = []
+        try:
+            updated = _attach(archive, members, verify, stored)
+        except BaseException:
+            # The blob rows rolled back with the transaction; drop the files
+            # this import wrote so they don't stay on disk unreferenced
+            eLabSchedule._meta.get_field('report_file').storage.discard_unreferenced(stored)
+            raise
+    return updated
+
+
+def _attach(archive, members, verify, stored):
+    """Attach ``members`` in one transaction, appending each stored file name to ``stored``."""
+    with transaction.atomic():
+        bookings = (eLabSchedule.objects.select_for_update().select_related('user')
+                    .in_bulk([booking_id for booking_id, _ in members]))
+        missing = [info.filename for booking_id, info in members if booking_id not in bookings]
+        if missing:  # deleted since the check above
+            raise ReportArchiveError([f"{name}: no such booking" for name in missing])
+
+        updated = []
+        for booking_id, info in members:
+            booking = bookings[booking_id]
+            try:
+                with archive.open(info) as stream:
+                    # Assigned uncommitted, like a form upload, so the old
+                    # report's blob reference is released (see signals.py)
+                    booking.report_file = File(stream, name=f'{booking_id}.pdf')
+                    booking.report_verified = booking.report_verified or verify
+                    booking.save(update_fields=['report_file', 'report_verified', 'updated_at'])
+            except MEMBER_READ_ERRORS as exc:  # checked above; rolls back if it fails now
+                raise ReportArchiveError([f"{info.filename}: {_describe(exc)}"])
+            finally:
+                # Set to the content-addressed name once the file is stored
+                if content_digest(booking.report_file.name):
+                    stored.append(booking.report_file.name)
+            notifications.elab_report_uploaded(booking)
+            updated.append(booking)
+    return updated
@@ -0,0 +1,68 @@
+"""
+Move delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS out
+of the hot Order/OrderItem tables into ArchivedOrder/ArchivedOrderItem.
+
+Runs in small batches, each in its own transaction, so checkout never
+waits long on the write lock.
+
+    python manage.py archive_orders [--days 180] [--batch-size 500] [--dry-run]
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+FINAL_STATUSES = ('delivered', 'cancelled')
+
+
+class Command(BaseCommand):
+    help = "Archive old delivered/cancelled orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help="Archive orders last updated more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report how many orders would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        candidates = Order.objects.filter(status__in=FINAL_STATUSES, updated_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{candidates.count()} order(s) would be archived.")
+            return
+
+        total = 0
+        while True:
+            ids = list(candidates.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                total += self.archive_batch(ids)
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} order(s)."))
+
+    def archive_batch(self, ids):
+        orders = Order.objects.filter(pk__in=ids)
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=o.pk, user_id=o.user_id, created_at=o.created_at, updated_at=o.updated_at,
+                is_paid=o.is_paid, total_price=o.total_price,
+                payment_method=o.payment_method, status=o.status,
+            )
+            for o in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order_id=it.order_id, sku_code=it.sku.code if it.sku else '',
+                name=it.name, quantity=it.quantity, price=it.price,
+            )
+            for it in OrderItem.objects.filter(order_id__in=ids).select_related('sku')
+        ])
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        return orders.delete()[1].get(Order._meta.label, 0)
@@ -0,0 +1,138 @@
+"""
+Run EXPLAIN QUERY PLAN over the hot ORM queries issued by main/views.py and
+flag full table scans and temporary sort B-trees.
+
+The querysets come from main/queries.py and the model helpers the views
+call, built with placeholder arguments. Scans listed in ACCEPTED_SCANS are
+reported with their reason but do not count towards --fail-on-scan.
+
+    python manage.py audit_query_plans [--fail-on-scan]
+"""
+
+import re
+from datetime import date, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main import queries
+from main.models import Prescription, PetProduct, Product, Sku
+
+# Any id works: SQLite plans depend on the schema, not on the values.
+USER_ID = DOCTOR_ID = CATEGORY_ID = 1
+TODAY = date(2024, 1, 1)
+
+# Django prefixes each plan row with "id parent notused".
+PLAN_ROW = re.compile(r'^[\s|`-]*(?:\d+ \d+ \d+ )?(?P<detail>.*)$')
+
+# Label -> why its full scan is expected and accepted
+ACCEPTED_SCANS = {
+    'search: medicines by name':
+        "substring match cannot use a B-tree index; misses fall back to the trigram index",
+    'search: pet products by name':
+        "substring match cannot use a B-tree index; misses fall back to the trigram index",
+    'manage_users: text search':
+        "staff-only substring search over four columns",
+    'manage_users: all users':
+        "walks the primary key newest first and stops at the page size",
+    'manage_users: active filter':
+        "boolean with two values; walks the primary key and stops at the page size",
+    'manage_users: joined range':
+        "auth_user has no date_joined index; walks the primary key and stops at the page size",
+}
+
+
+def hot_queries():
+    """(label, queryset) pairs, built the way views.py builds them."""
+    history = queries.patient_history(USER_ID)
+    bookings, by_type = queries.lab_bookings({}, TODAY)
+    all_bookings, _ = queries.lab_bookings({}, None)
+    return [
+        ('add_to_cart: sku by code',
+         Sku.objects.filter(code='MED-1')),
+        ('update_cart/remove_from_cart: line by user + sku code',
+         queries.cart_line(USER_ID, 'MED-1')),
+        ('cart/checkout: approved prescriptions',
+         queries.approved_prescription_products(USER_ID, [1, 2])),
+        ('product_list: products by category',
+         Product.objects.filter(category_id=CATEGORY_ID)),
+        ('pet_category_products: products by category',
+         PetProduct.objects.filter(category_id=CATEGORY_ID)),
+        ('search: medicines by name', queries.name_search(Product, 'para')),
+        ('search: pet products by name', queries.name_search(PetProduct, 'para')),
+        ('book_appointment: slot taken',
+         queries.slot_taken(DOCTOR_ID, TODAY, time(10))),
+        ('doctor_dashboard: appointments',
+         queries.doctor_appointments(DOCTOR_ID)),
+        *((f'patient_dashboard: {name}', queryset) for name, queryset in history.items()),
+        ('requested_prescriptions: live leases',
+         Prescription.leased_to(DOCTOR_ID)),
+        ('requested_prescriptions: claimable queue',
+         Prescription.claimable()),
+        ('manage_users: all users', queries.user_directory({})),
+        ('manage_users: text search', queries.user_directory({'q': 'rahman'})),
+        ('manage_users: active filter', queries.user_directory({'active': 'yes'})),
+        ('manage_users: joined range',
+         queries.user_directory({'joined_from': TODAY, 'joined_to': TODAY})),
+        ('lab console: one day', bookings),
+        ('lab console: one day, unpaid',
+         queries.lab_bookings({'paid': 'no'}, TODAY)[0]),
+        ('lab console: one day, by test type',
+         queries.lab_bookings({'test_type': 'Blood'}, TODAY)[0]),
+        ('lab console: all dates', all_bookings),
+        ('lab console: per-day counters',
+         queries.lab_day_counts(by_type, TODAY, TODAY)),
+    ]
+
+
+def problems_in(plan):
+    """Return the plan lines that indicate a full scan or an extra sort."""
+    flagged = []
+    for line in plan.splitlines():
+        detail = PLAN_ROW.match(line).group('detail').strip()
+        if detail.startswith('SCAN') and 'INDEX' not in detail:
+            flagged.append(f"full scan: {detail}")
+        elif detail.startswith('USE TEMP B-TREE'):
+            flagged.append(f"sort: {detail}")
+    return flagged
+
+
+class Command(BaseCommand):
+    help = "Audit the query plans of hot view queries and flag full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Exit with an error if a query not in ACCEPTED_SCANS performs a full table scan.")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the full plan for every query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("audit_query_plans only understands SQLite query plans.")
+
+        scans = 0
+        for label, queryset in hot_queries():
+            plan = queryset.explain()
+            flagged = problems_in(plan)
+            scanned = any(f.startswith('full scan') for f in flagged)
+            if scanned and label in ACCEPTED_SCANS:
+                status, style = 'ok* ', self.style.WARNING
+                flagged.append(f"accepted: {ACCEPTED_SCANS[label]}")
+            elif scanned:
+                scans += 1
+                status, style = 'FLAG', self.style.ERROR
+            elif flagged:
+                status, style = 'FLAG', self.style.WARNING
+            else:
+                status, style = 'ok  ', self.style.SUCCESS
+
+            self.stdout.write(style(f"{status} {label}"))
+            for line in flagged:
+                self.stdout.write(f"       {line}")
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"       | {line}")
+
+        self.stdout.write(f"\n{scans} quer{'y' if scans == 1 else 'ies'} with unexpected full table scans.")
+        if scans and options['fail_on_scan']:
+            raise CommandError("Full table scans found.")
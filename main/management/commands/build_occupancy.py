@@ -0,0 +1,131 @@
+"""
+Rebuild the doctor occupancy heatmaps (DoctorOccupancy).
+
+For every doctor, Schedule rows become a weekday x hour matrix of bookable
+slots per week. Appointments from the last --weeks weeks are counted into
+a doctors x weeks x weekday x hour array with one np.add.at, so the cost
+is one pass over the appointments whatever the number of doctors.
+
+The forecast fits a least-squares trend line per (weekday, hour) cell
+across the weeks. Weekly seasonality comes from keeping the cells apart.
+The line is extrapolated one week ahead and blended with the plain mean,
+so a single busy week does not swing it. Cells forecast at or above
+--saturated of capacity are suggested for extra hours. Scheduled cells at
+or below --idle are suggested for trimming. Demand at unscheduled hours
+is flagged too.
+
+Requires numpy.
+
+    python manage.py build_occupancy [--weeks 12] [--slot-minutes 30]
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import DAYS_OF_WEEK, Appointment, Doctor, DoctorOccupancy, Schedule
+
+WEEKDAYS = [day for day, _ in DAYS_OF_WEEK]  # Monday first, like date.weekday()
+SUGGESTIONS_PER_KIND = 5
+
+
+class Command(BaseCommand):
+    help = "Compute weekday x hour occupancy and next-week forecasts for every doctor."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=12, help="History window in weeks.")
+        parser.add_argument('--slot-minutes', type=int, default=30)
+        parser.add_argument('--saturated', type=float, default=0.9)
+        parser.add_argument('--idle', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("build_occupancy needs numpy (pip install numpy).")
+
+        weeks = options['weeks']
+        doctor_ids = list(Doctor.objects.order_by('pk').values_list('pk', flat=True))
+        if not doctor_ids or weeks < 1:
+            self.stdout.write("Nothing to compute.")
+            return
+        index = {pk: i for i, pk in enumerate(doctor_ids)}
+
+        capacity = self.capacity(np, index, options['slot_minutes'])
+        counts = self.counts(np, index, weeks)
+
+        booked = counts.mean(axis=1)
+        forecast = self.forecast(np, counts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            load = np.where(capacity > 0, forecast / capacity, 0.0)
+
+        scheduled = capacity.sum(axis=(1, 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.where(scheduled > 0, (booked * (capacity > 0)).sum(axis=(1, 2)) / scheduled, 0.0)
+        saturated = (capacity > 0) & (load >= options['saturated'])
+        idle = (capacity > 0) & (load <= options['idle'])
+        unscheduled = (capacity == 0) & (forecast >= 0.5)
+
+        records = []
+        for pk, i in index.items():
+            suggestions = []
+            for kind, mask in (('add', saturated[i]), ('trim', idle[i]), ('unscheduled', unscheduled[i])):
+                cells = np.argwhere(mask)
+                # Most pressing first: highest demand for add/unscheduled, lowest for trim
+                order = np.argsort(forecast[i][mask] * (1 if kind == 'trim' else -1), kind='stable')
+                for day, hour in cells[order][:SUGGESTIONS_PER_KIND]:
+                    suggestions.append([kind, int(day), int(hour),
+                                        round(float(forecast[i, day, hour]), 2),
+                                        round(float(capacity[i, day, hour]), 2)])
+            records.append(DoctorOccupancy(
+                doctor_id=pk,
+                weeks=weeks,
+                capacity=np.round(capacity[i], 2).tolist(),
+                booked=np.round(booked[i], 2).tolist(),
+                forecast=np.round(forecast[i], 2).tolist(),
+                suggestions=suggestions,
+                utilization=round(float(utilization[i]), 4),
+                saturated_hours=int(saturated[i].sum()),
+            ))
+
+        with transaction.atomic():
+            DoctorOccupancy.objects.all().delete()
+            DoctorOccupancy.objects.bulk_create(records, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Occupancy for {len(records)} doctors over {weeks} weeks."
+        ))
+
+    def capacity(self, np, index, slot_minutes):
+        """doctors x 7 x 24 bookable slots per week, from schedule minutes."""
+        minutes = np.zeros((len(index), 7, 24 * 60), dtype=bool)
+        for doctor_id, day, start, end in Schedule.objects.values_list('doctor_id', 'day', 'start_time', 'end_time'):
+            first, last = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+            minutes[index[doctor_id], WEEKDAYS.index(day), first:last] = True
+        return minutes.reshape(len(index), 7, 24, 60).sum(axis=3) / slot_minutes
+
+    def counts(self, np, index, weeks):
+        """doctors x weeks x 7 x 24 appointment counts for the window ending yesterday."""
+        end = timezone.localdate()
+        start = end - timedelta(weeks=weeks)
+        rows = (Appointment.objects.filter(date__gte=start, date__lt=end)
+                .exclude(status__iexact='cancelled')
+                .values_list('doctor_id', 'date', 'time'))
+        counts = np.zeros((len(index), weeks, 7, 24))
+        rows = [(index[d], (day - start).days // 7, day.weekday(), t.hour) for d, day, t in rows]
+        if rows:
+            np.add.at(counts, tuple(np.array(rows).T), 1)
+        return counts
+
+    def forecast(self, np, counts):
+        """Next-week demand per cell: half trend-line extrapolation, half mean."""
+        weeks = counts.shape[1]
+        mean = counts.mean(axis=1)
+        if weeks < 2:
+            return mean
+        t = np.arange(weeks, dtype=float) - (weeks - 1) / 2
+        slope = np.tensordot(t, counts, axes=(0, 1)) / (t ** 2).sum()
+        trend = mean + slope * (weeks - (weeks - 1) / 2)
+        return np.clip((trend + mean) / 2, 0, None)
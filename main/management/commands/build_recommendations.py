@@ -0,0 +1,114 @@
+"""
+Rebuild the "frequently bought together" table (SkuNeighbours).
+
+Every order line (live and archived, medicines and pet products) becomes a
+1 in a sparse orders x SKUs matrix X. X.T @ X is then the item-item
+co-occurrence matrix. Scores are cosine similarity, count(a, b) /
+sqrt(count(a) * count(b)), which keeps best-sellers from topping every
+list. The top --top-k neighbours with at least --min-support shared orders
+are stored per SKU. Order lines are read in chunks straight into NumPy
+arrays, so memory stays proportional to the number of lines, not rows of
+Python objects.
+
+Requires numpy and scipy.
+
+    python manage.py build_recommendations [--top-k 10] [--min-support 2]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.models import ArchivedOrderItem, OrderItem, Sku, SkuNeighbours
+
+CHUNK_SIZE = 50_000
+
+
+class Command(BaseCommand):
+    help = "Compute frequently-bought-together neighbours for every SKU."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.RECOMMENDATIONS_PER_SKU)
+        parser.add_argument('--min-support', type=int, default=2,
+                            help="Minimum number of orders two SKUs must share.")
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from scipy import sparse
+        except ImportError:
+            raise CommandError("build_recommendations needs numpy and scipy (pip install numpy scipy).")
+
+        orders, skus = self.load_lines(np)
+        if not len(orders):
+            self.stdout.write("No order lines yet.")
+            return
+
+        # Dense 0..n-1 indices for both axes
+        order_keys, order_idx = np.unique(orders, return_inverse=True)
+        sku_keys, sku_idx = np.unique(skus, return_inverse=True)
+        X = sparse.csr_matrix(
+            (np.ones(len(order_idx), dtype=np.float32), (order_idx, sku_idx)),
+            shape=(len(order_keys), len(sku_keys)),
+        )
+        X.data[:] = 1  # an SKU twice in one order still counts once
+
+        co = (X.T @ X).tocsr()
+        counts = co.diagonal().copy()
+        co.setdiag(0)
+        co.data[co.data < options['min_support']] = 0
+        co.eliminate_zeros()
+
+        # Cosine normalisation, vectorised over all non-zeros at once
+        rows = np.repeat(np.arange(co.shape[0]), np.diff(co.indptr))
+        co.data = co.data / np.sqrt(counts[rows] * counts[co.indices])
+
+        top_k = options['top_k']
+        records = []
+        for i in range(co.shape[0]):
+            start, end = co.indptr[i], co.indptr[i + 1]
+            if start == end:
+                continue
+            data, cols = co.data[start:end], co.indices[start:end]
+            best = np.argsort(-data, kind='stable')[:top_k]
+            records.append(SkuNeighbours(
+                sku_id=int(sku_keys[i]),
+                neighbours=[[int(sku_keys[c]), round(float(s), 4)] for c, s in zip(cols[best], data[best])],
+            ))
+
+        with transaction.atomic():
+            SkuNeighbours.objects.all().delete()
+            SkuNeighbours.objects.bulk_create(records, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(records)} SKUs with neighbours from {len(orders)} order lines "
+            f"across {len(order_keys)} orders."
+        ))
+
+    def load_lines(self, np):
+        """(order ids, sku ids) for every order line as int64 arrays."""
+        parts = []
+        live = (OrderItem.objects.filter(sku__isnull=False)
+                .values_list('order_id', 'sku_id').iterator(chunk_size=CHUNK_SIZE))
+        parts.append(self.to_array(np, live))
+
+        # Archived orders keep their original id; their lines only keep the SKU code
+        code_to_id = dict(Sku.objects.values_list('code', 'pk'))
+        archived = ((order_id, code_to_id[code]) for order_id, code in
+                    ArchivedOrderItem.objects.values_list('order_id', 'sku_code').iterator(chunk_size=CHUNK_SIZE)
+                    if code in code_to_id)
+        parts.append(self.to_array(np, archived))
+
+        lines = np.concatenate(parts)
+        return lines[:, 0], lines[:, 1]
+
+    def to_array(self, np, pairs):
+        chunks, buffer = [], []
+        for pair in pairs:
+            buffer.append(pair)
+            if len(buffer) == CHUNK_SIZE:
+                chunks.append(np.array(buffer, dtype=np.int64))
+                buffer = []
+        if buffer:
+            chunks.append(np.array(buffer, dtype=np.int64))
+        return np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
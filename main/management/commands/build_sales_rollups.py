@@ -0,0 +1,146 @@
+"""
+Refresh the daily sales rollups (DailySales, DailyItemSales) read by the
+staff sales dashboard.
+
+Only days with an order created or changed since the last run are rebuilt,
+found through Order.updated_at past the stored watermark. --full rebuilds
+every day. Each batch of days is loaded with a few flat queries, grouped
+with pandas, and swapped in with one delete and bulk insert per table.
+Archived orders are included, so archiving never removes history from the
+rollups. Orders deleted outright only drop out on the next --full run.
+
+Requires pandas.
+
+    python manage.py build_sales_rollups [--full] [--batch-days 31]
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from main.cache import bump_model_version
+from main.models import (
+    ArchivedOrder, ArchivedOrderItem, DailyItemSales, DailySales, Order, OrderItem,
+    RollupWatermark, Sku,
+)
+
+WATERMARK = 'sales'
+# Re-read a little before the last run so slow-committing writes are not missed
+WATERMARK_MARGIN = timedelta(minutes=1)
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2)))
+
+
+class Command(BaseCommand):
+    help = "Recompute daily sales rollups for days with new or changed orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day.")
+        parser.add_argument('--batch-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise CommandError("build_sales_rollups needs pandas (pip install pandas).")
+
+        started = timezone.now()
+        watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+        days = self.changed_days(None if options['full'] or watermark is None else watermark.value)
+
+        catalog = self.catalog(pd)
+        for start in range(0, len(days), options['batch_days']):
+            batch = days[start:start + options['batch_days']]
+            self.rebuild(pd, batch, catalog)
+
+        RollupWatermark.objects.update_or_create(
+            name=WATERMARK, defaults={'value': started - WATERMARK_MARGIN})
+        bump_model_version('sales')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {len(days)} day(s)."))
+
+    def changed_days(self, since):
+        live = Order.objects.all()
+        if since is not None:
+            live = live.filter(updated_at__gt=since)
+        days = set(live.annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct())
+        if since is None:
+            days |= set(ArchivedOrder.objects.annotate(day=TruncDate('created_at'))
+                        .values_list('day', flat=True).distinct())
+        return sorted(days)
+
+    def catalog(self, pd):
+        """One row per SKU code: current name, category label and Rx flag."""
+        rows = Sku.objects.values_list(
+            'code', 'product__name', 'pet_product__name',
+            'product__category__name', 'pet_product__category__name',
+            'product__requires_prescription', 'pet_product__prescription_required',
+        )
+        frame = pd.DataFrame(list(rows), columns=[
+            'code', 'med_name', 'pet_name', 'med_category', 'pet_category', 'med_rx', 'pet_rx',
+        ])
+        return pd.DataFrame({
+            'code': frame['code'],
+            'catalog_name': frame['med_name'].fillna(frame['pet_name']),
+            'category': frame['med_category'].fillna('Pet: ' + frame['pet_category'].fillna('Other')),
+            'prescription': frame['med_rx'].fillna(frame['pet_rx']).fillna(False).astype(bool),
+        })
+
+    def rebuild(self, pd, batch, catalog):
+        tz = timezone.get_current_timezone()
+        lower = datetime.combine(batch[0], time.min, tzinfo=tz)
+        upper = datetime.combine(batch[-1] + timedelta(days=1), time.min, tzinfo=tz)
+
+        orders, lines = [], []
+        for order_model, item_model, sku_field in (
+            (Order, OrderItem, 'sku__code'),
+            (ArchivedOrder, ArchivedOrderItem, 'sku_code'),
+        ):
+            in_range = dict(created_at__gte=lower, created_at__lt=upper)
+            orders += list(order_model.objects.filter(**in_range).exclude(status='cancelled')
+                           .annotate(day=TruncDate('created_at'))
+                           .values_list('id', 'day', 'payment_method', 'total_price'))
+            lines += list(item_model.objects
+                          .filter(**{f'order__{k}': v for k, v in in_range.items()})
+                          .exclude(order__status='cancelled')
+                          .values_list('order_id', sku_field, 'name', 'quantity', 'price'))
+
+        orders = pd.DataFrame(orders, columns=['order_id', 'day', 'payment_method', 'total'])
+        orders = orders[orders['day'].isin(batch)]
+        lines = pd.DataFrame(lines, columns=['order_id', 'code', 'name', 'quantity', 'price'])
+        lines = lines.merge(orders[['order_id', 'day']], on='order_id')
+
+        daily = (orders.assign(total=orders['total'].astype(float))
+                 .groupby(['day', 'payment_method'])
+                 .agg(orders=('order_id', 'size'), revenue=('total', 'sum'))
+                 .reset_index())
+
+        lines['code'] = lines['code'].fillna('')
+        lines['revenue'] = lines['quantity'] * lines['price'].astype(float)
+        items = (lines.groupby(['day', 'code'])
+                 .agg(name=('name', 'first'), quantity=('quantity', 'sum'), revenue=('revenue', 'sum'))
+                 .reset_index()
+                 .merge(catalog, on='code', how='left'))
+        items['name'] = items['catalog_name'].fillna(items['name'])
+        items['category'] = items['category'].fillna('Other')
+        items['prescription'] = items['prescription'].fillna(False).astype(bool)
+
+        with transaction.atomic():
+            DailySales.objects.filter(day__in=batch).delete()
+            DailyItemSales.objects.filter(day__in=batch).delete()
+            DailySales.objects.bulk_create([
+                DailySales(day=row.day, payment_method=row.payment_method,
+                           orders=int(row.orders), revenue=_money(row.revenue))
+                for row in daily.itertuples(index=False)
+            ], batch_size=500)
+            DailyItemSales.objects.bulk_create([
+                DailyItemSales(day=row.day, sku_code=row.code, name=row.name[:255],
+                               category=row.category[:255], prescription=bool(row.prescription),
+                               quantity=int(row.quantity), revenue=_money(row.revenue))
+                for row in items.itertuples(index=False)
+            ], batch_size=500)
@@ -0,0 +1,51 @@
+"""
+Move uploads saved before content-addressed storage onto content-hash
+names, sharing identical files and deleting the old copies.
+
+    python manage.py dedupe_media [--dry-run]
+"""
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from main.signals import UPLOAD_FIELDS
+from main.storage import content_digest
+
+
+class Command(BaseCommand):
+    help = "Re-store legacy uploads by content hash and drop duplicate files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        moved = missing = bytes_before = 0
+        for model, field_name in UPLOAD_FIELDS.items():
+            field = model._meta.get_field(field_name)
+            storage = field.storage
+            rows = (model.objects.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .values_list('pk', field_name))
+
+            for pk, name in rows.iterator():
+                if content_digest(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                bytes_before += storage.size(name)
+                if options['dry_run']:
+                    moved += 1
+                    continue
+
+                with storage.open(name) as f:
+                    new_name = storage.save(os.path.join(os.path.dirname(name), os.path.basename(name)), f)
+                model.objects.filter(pk=pk).update(**{field_name: new_name})
+                storage.delete(name)
+                moved += 1
+
+        verb = "would be moved" if options['dry_run'] else "moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} legacy upload(s) {verb} ({bytes_before} bytes); {missing} missing on disk."
+        ))
@@ -0,0 +1,63 @@
+"""
+Delete empty and abandoned carts in small chunks.
+
+A cart is abandoned when neither the cart nor any of its lines has been
+touched for CART_ABANDON_AFTER_DAYS; empty carts are removed after
+EMPTY_CART_AFTER_DAYS. Each chunk is its own short transaction so the
+SQLite write lock is never held for long; --pause yields between chunks.
+
+    python manage.py gc_carts [--days 30] [--empty-days 1] [--batch-size 500] [--pause 0.05]
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from main.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = "Garbage-collect empty and abandoned carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CART_ABANDON_AFTER_DAYS)
+        parser.add_argument('--empty-days', type=int, default=settings.EMPTY_CART_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between chunks.")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        abandoned_cutoff = now - timedelta(days=options['days'])
+        empty_cutoff = now - timedelta(days=options['empty_days'])
+
+        any_items = CartItem.objects.filter(cart=OuterRef('pk'))
+        recent_items = any_items.filter(updated_at__gte=abandoned_cutoff)
+
+        empty = Cart.objects.filter(~Exists(any_items), created_at__lt=empty_cutoff)
+        abandoned = Cart.objects.filter(~Exists(recent_items), created_at__lt=abandoned_cutoff)
+
+        for label, carts in (('empty', empty), ('abandoned', abandoned)):
+            if options['dry_run']:
+                self.stdout.write(f"{carts.count()} {label} cart(s) would be deleted.")
+                continue
+            deleted = self.delete_in_chunks(carts, options['batch_size'], options['pause'])
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} {label} cart(s)."))
+
+    def delete_in_chunks(self, carts, batch_size, pause):
+        total = 0
+        while True:
+            ids = list(carts.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return total
+            with transaction.atomic():
+                CartItem.objects.filter(cart_id__in=ids).delete()
+                total += Cart.objects.filter(pk__in=ids).delete()[0]
+            if pause:
+                time.sleep(pause)
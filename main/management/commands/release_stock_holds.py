@@ -0,0 +1,35 @@
+"""
+Delete lapsed checkout stock holds in batches.
+
+Expired holds already stop counting against stock the moment they lapse;
+this only keeps the table small. Each batch is one indexed range scan on
+expires_at and one DELETE.
+
+    python manage.py release_stock_holds [--batch-size 1000] [--pause 0.05]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release expired stock holds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            released = release_expired(options['batch_size'])
+            total += released
+            if released < options['batch_size']:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Released {total} expired hold(s)."))
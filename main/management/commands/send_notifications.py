@@ -0,0 +1,97 @@
+"""
+Deliver pending outbox notifications as one digest email per recipient.
+
+Views only insert Notification rows (main/notifications.py); this command
+does the slow part. Each pass picks up to --batch-size recipients with
+pending rows, folds everything waiting for each one into a single email and
+sends the lot over one backend connection. EMAIL_BACKEND picks the
+transport: console or file locally, SMTP in production. Failed sends are
+retried on later passes, up to NOTIFICATION_MAX_ATTEMPTS.
+
+Run one dispatcher at a time, e.g. from cron:
+
+    python manage.py send_notifications [--batch-size 200] [--loop 60]
+"""
+
+import textwrap
+import time
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from main.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Send pending notifications as per-recipient digests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Recipients per pass.")
+        parser.add_argument('--loop', type=float, default=0,
+                            help="Keep running, sleeping this many seconds between passes.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = self.dispatch(options['batch_size'])
+            if sent:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} digest(s)."))
+            if not options['loop']:
+                if not sent:
+                    self.stdout.write("Nothing to send.")
+                return
+            if not sent:
+                time.sleep(options['loop'])
+
+    def dispatch(self, batch_size):
+        """One pass; returns the number of digests delivered."""
+        pending = Notification.objects.filter(
+            sent_at__isnull=True, attempts__lt=settings.NOTIFICATION_MAX_ATTEMPTS,
+        )
+        recipient_ids = list(pending.order_by('recipient_id')
+                             .values_list('recipient_id', flat=True).distinct()[:batch_size])
+        if not recipient_ids:
+            return 0
+
+        rows = (pending.filter(recipient_id__in=recipient_ids)
+                .select_related('recipient').order_by('recipient_id', 'created_at'))
+        delivered, failed = [], []
+        sent = 0
+
+        connection = get_connection()
+        connection.open()
+        try:
+            for _, group in groupby(rows, key=lambda n: n.recipient_id):
+                group = list(group)
+                ids = [n.pk for n in group]
+                email = group[0].recipient.email
+                if not email:
+                    # Nowhere to deliver; don't retry forever
+                    delivered.extend(ids)
+                    continue
+                try:
+                    connection.send_messages([self.digest(email, group)])
+                except Exception as exc:
+                    self.stderr.write(f"Sending to {email} failed: {exc}")
+                    failed.extend(ids)
+                else:
+                    delivered.extend(ids)
+                    sent += 1
+        finally:
+            connection.close()
+
+        Notification.objects.filter(pk__in=delivered).update(sent_at=timezone.now())
+        Notification.objects.filter(pk__in=failed).update(attempts=F('attempts') + 1)
+        return sent
+
+    def digest(self, email, group):
+        if len(group) == 1:
+            subject = group[0].subject
+        else:
+            subject = f"{len(group)} updates from MediMart"
+        body = "\n\n".join(f"- {n.subject}\n{textwrap.indent(n.body, '  ')}" for n in group)
+        return EmailMessage(f"[MediMart] {subject}", body, to=[email])
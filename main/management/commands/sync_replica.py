@@ -0,0 +1,46 @@
+"""
+Refresh the read replica from the primary SQLite database.
+
+Uses SQLite's online backup API, so the primary stays writable while the
+copy is taken, then atomically swaps the new file into place. Replica
+connections are closed after every request (CONN_MAX_AGE 0), so the next
+request opens the new file.
+"""
+
+import os
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.db import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Copy the default SQLite database onto the configured read replica."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1024,
+                            help="Pages copied per backup step (default: 1024).")
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections.databases:
+            raise CommandError("No 'replica' database configured (set MEDIMART_DB_REPLICA).")
+
+        source_path = str(connections.databases['default']['NAME'])
+        replica_path = str(connections.databases[REPLICA_ALIAS]['NAME'])
+        tmp_path = f"{replica_path}.tmp"
+
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target, pages=options['pages'])
+            # The replica is never written to, so it does not need WAL files
+            # that could be confused between the old and the swapped-in copy.
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+            source.close()
+
+        os.replace(tmp_path, replica_path)
+        self.stdout.write(self.style.SUCCESS(f"Replica refreshed: {replica_path}"))
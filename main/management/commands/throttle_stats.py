@@ -0,0 +1,30 @@
+"""
+Show how many login/signup POSTs the auth throttle let through or rejected.
+
+    python manage.py throttle_stats [--reset]
+
+Counters live in the default cache, so with LocMem they only cover the
+process running this command; point MEDIMART_CACHE_DIR at the shared cache
+to see the web workers' numbers.
+"""
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from main.throttle import COUNTER_KEY, throttle_counters
+
+
+class Command(BaseCommand):
+    help = "Print (and optionally reset) login/signup throttle counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true')
+
+    def handle(self, *args, **options):
+        counters = throttle_counters()
+        for (scope, outcome), value in sorted(counters.items()):
+            self.stdout.write(f"{scope:<8} {outcome:<9} {value}")
+
+        if options['reset']:
+            cache.delete_many([COUNTER_KEY.format(*pair) for pair in counters])
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,142 @@
+# main/media.py
+"""
+Serving of private uploads (prescriptions, appointment prescriptions, lab
+reports). Access is checked in the view; the bytes are handed to the web
+server through X-Sendfile / X-Accel-Redirect when configured, otherwise
+streamed with FileResponse (sendfile-capable under WSGI) with support for
+single byte ranges and conditional requests.
+"""
+
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .storage import content_digest
+
+PROTECTED_MEDIA_DIRS = ('prescriptions', 'appointment_prescriptions', 'elab_reports')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _LimitedFile:
+    """File wrapper that stops after ``length`` bytes (for closed ranges)."""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+
+def resolve_media_path(path):
+    """Absolute path of a media file, refusing anything outside MEDIA_ROOT."""
+    root = Path(settings.MEDIA_ROOT).resolve()
+    full = (root / path).resolve()
+    if root not in full.parents or not full.is_file():
+        raise Http404("File not found.")
+    return full
+
+
+def _parse_range(header, size):
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes; none (bytes=-0, empty file) is unsatisfiable
+        length = min(int(end), size)
+        return (size - length, size - 1) if length else None
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def serve_media_file(request, path):
+    full_path = resolve_media_path(path)
+    stat = full_path.stat()
+    digest = content_digest(path)
+    # Content-addressed names never change content: the hash is the ETag
+    etag = quote_etag(digest or f"{int(stat.st_mtime)}-{stat.st_size}")
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(str(full_path))
+    content_type = content_type or 'application/octet-stream'
+
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend in ('xsendfile', 'xaccel'):
+        response = HttpResponse(content_type=content_type)
+        if backend == 'xsendfile':
+            response['X-Sendfile'] = str(full_path)
+        else:
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + path.lstrip('/')
+    else:
+        response = _file_response(request, full_path, stat.st_size, etag, last_modified, content_type)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if digest:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    response['Content-Disposition'] = f'inline; filename="{os.path.basename(full_path)}"'
+    return response
+
+
+def _file_response(request, full_path, size, etag, last_modified, content_type):
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    f = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        f.seek(start)
+        # Open-ended ranges can still go out through sendfile; a closed range
+        # has to stop early, so it is streamed through a bounded reader.
+        body = f if end == size - 1 else _LimitedFile(f, length)
+        response = FileResponse(body, status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_alter_elabschedule_test_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sku',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('kind', models.CharField(choices=[('med', 'Medicine'), ('pet', 'Pet product')], max_length=3)),
+                ('pet_product', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sku', to='main.petproduct')),
+                ('product', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sku', to='main.product')),
+            ],
+            options={
+                'verbose_name': 'SKU',
+            },
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='sku',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='main.sku'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='main.sku'),
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'sku'], name='cartitem_cart_sku_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sku',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('kind', 'med'), ('pet_product__isnull', True), ('product__isnull', False)), models.Q(('kind', 'pet'), ('pet_product__isnull', False), ('product__isnull', True)), _connector='OR'), name='sku_exactly_one_item'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_skus(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    PetProduct = apps.get_model('main', 'PetProduct')
+    Sku = apps.get_model('main', 'Sku')
+    CartItem = apps.get_model('main', 'CartItem')
+    OrderItem = apps.get_model('main', 'OrderItem')
+
+    Sku.objects.bulk_create(
+        [Sku(code=f"MED-{pk}", kind='med', product_id=pk)
+         for pk in Product.objects.values_list('pk', flat=True)] +
+        [Sku(code=f"PET-{pk}", kind='pet', pet_product_id=pk)
+         for pk in PetProduct.objects.values_list('pk', flat=True)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    for model in (CartItem, OrderItem):
+        model.objects.filter(product__isnull=False).update(
+            sku=Subquery(Sku.objects.filter(product=OuterRef('product')).values('pk')[:1])
+        )
+        model.objects.filter(product__isnull=True, pet_product__isnull=False).update(
+            sku=Subquery(Sku.objects.filter(pet_product=OuterRef('pet_product')).values('pk')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_sku'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
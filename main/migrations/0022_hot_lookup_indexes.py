@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_backfill_sku'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctor',
+            name='doctor_type',
+            field=models.CharField(choices=[('human', 'Human Doctor'), ('vet', 'Veterinarian')], db_index=True, default='human', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'time'], name='appt_patient_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'product'], name='cartitem_cart_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'pet_product'], name='cartitem_cart_petproduct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='elabschedule',
+            index=models.Index(fields=['user', '-created_at'], name='elab_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'status'], name='rx_patient_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', '-uploaded_at'], name='rx_patient_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'uploaded_at'], name='rx_status_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_hot_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_prescriptions', to='main.doctor'),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['claimed_by', 'lease_expires_at'], name='rx_claim_lease_idx'),
+        ),
+    ]
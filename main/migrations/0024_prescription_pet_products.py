@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_prescription_review_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='pet_products',
+            field=models.ManyToManyField(blank=True, related_name='prescriptions', to='main.petproduct'),
+        ),
+    ]
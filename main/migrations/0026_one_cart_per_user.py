@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Fold every user's extra carts into their oldest one."""
+    Cart = apps.get_model('main', 'Cart')
+    CartItem = apps.get_model('main', 'CartItem')
+
+    duplicated = (Cart.objects.values('user_id')
+                  .annotate(n=Count('id'), keep=Min('id'))
+                  .filter(n__gt=1))
+    for row in duplicated:
+        keep_id = row['keep']
+        extra_ids = list(Cart.objects.filter(user_id=row['user_id'])
+                         .exclude(pk=keep_id).values_list('pk', flat=True))
+        kept = {
+            (it.sku_id, it.product_id, it.pet_product_id): it
+            for it in CartItem.objects.filter(cart_id=keep_id)
+        }
+        for it in CartItem.objects.filter(cart_id__in=extra_ids):
+            key = (it.sku_id, it.product_id, it.pet_product_id)
+            if key in kept:
+                kept[key].quantity += it.quantity
+                kept[key].save(update_fields=['quantity'])
+                it.delete()
+            else:
+                it.cart_id = keep_id
+                it.save(update_fields=['cart'])
+                kept[key] = it
+        Cart.objects.filter(pk__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_order_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cart',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cart', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:36
+
+import main.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_one_cart_per_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='prescription_file',
+            field=models.FileField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='appointment_prescriptions/'),
+        ),
+        migrations.AlterField(
+            model_name='elabschedule',
+            name='report_file',
+            field=models.FileField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='elab_reports/'),
+        ),
+        migrations.AlterField(
+            model_name='prescription',
+            name='image',
+            field=models.ImageField(storage=main.storage.ContentAddressedStorage(), upload_to='prescriptions/'),
+        ),
+    ]
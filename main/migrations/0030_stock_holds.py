@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petproduct',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='main.cart')),
+                ('sku', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='main.sku')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sku', 'expires_at'], name='hold_sku_expires_idx'), models.Index(fields=['expires_at'], name='hold_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart', 'sku'), name='uniq_hold_cart_sku')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0031_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkuNeighbours',
+            fields=[
+                ('sku', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='neighbours', serialize=False, to='main.sku')),
+                ('neighbours', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'SKU neighbours',
+            },
+        ),
+    ]
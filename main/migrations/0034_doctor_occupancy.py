@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0033_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorOccupancy',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='main.doctor')),
+                ('weeks', models.PositiveSmallIntegerField()),
+                ('capacity', models.JSONField(default=list)),
+                ('booked', models.JSONField(default=list)),
+                ('forecast', models.JSONField(default=list)),
+                ('suggestions', models.JSONField(default=list)),
+                ('utilization', models.FloatField(default=0)),
+                ('saturated_hours', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'doctor occupancy',
+            },
+        ),
+    ]
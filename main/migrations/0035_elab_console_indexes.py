@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0034_doctor_occupancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='elabschedule',
+            index=models.Index(fields=['preferred_date', 'preferred_time'], name='elab_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='elabschedule',
+            index=models.Index(fields=['test_type', 'preferred_date'], name='elab_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='elabschedule',
+            index=models.Index(fields=['is_paid', 'preferred_date'], name='elab_paid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='elabschedule',
+            index=models.Index(fields=['report_verified', 'preferred_date'], name='elab_verified_date_idx'),
+        ),
+    ]
@@ -1,9 +1,16 @@
+from datetime import timedelta
 from decimal import Decimal
-from django.db import models
+from django.conf import settings
+from django.db import models, connection, transaction
 from django.contrib.auth.models import User
-from django.db.models import UniqueConstraint, CheckConstraint, Q, F, Sum
+from django.core.exceptions import ValidationError
+from django.db.models import UniqueConstraint, CheckConstraint, Q, F, Sum, Exists, OuterRef
+from django.utils import timezone
+import secrets
 import uuid
 
+from .storage import upload_storage
+
 # -------------------- CATEGORY & PRODUCT --------------------
 
 class Category(models.Model):
@@ -35,6 +42,10 @@ class Product(models.Model):
             CheckConstraint(check=Q(stock__gte=0), name='product_stock_non_negative'),
         ]
 
+    @property
+    def sku_code(self):
+        return Sku.code_for(Sku.KIND_MEDICINE, self.pk)
+
     def __str__(self):
         return self.name
 
@@ -63,6 +74,15 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=30, choices=PAYMENT_METHOD_CHOICES, default='Bkash')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # build_sales_rollups finds changed orders by updated_at and
+            # loads whole days by created_at
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.pk} by {self.user.username}"
 
@@ -116,7 +136,8 @@ class Doctor(models.Model):
     doctor_type = models.CharField(
         max_length=10,
         choices=DOCTOR_TYPES,
-        default='human'
+        default='human',
+        db_index=True
     )
     languages = models.CharField(max_length=100)
     location = models.CharField(max_length=100)
@@ -190,7 +211,7 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, default='Booked')
 
     meeting_link = models.URLField(blank=True, null=True)
-    prescription_file = models.FileField(upload_to='appointment_prescriptions/', blank=True, null=True)
+    prescription_file = models.FileField(upload_to='appointment_prescriptions/', storage=upload_storage, blank=True, null=True)
 
     # Payment fields
     is_paid = models.BooleanField(default=False)
@@ -198,10 +219,16 @@ class Appointment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     transaction_id = models.CharField(max_length=100, blank=True, null=True)
 
+    # Drives the calendar feed ETag (main/ical.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         constraints = [
             UniqueConstraint(fields=('doctor', 'date', 'time'), name='uniq_doctor_slot'),
         ]
+        indexes = [
+            models.Index(fields=['patient', 'date', 'time'], name='appt_patient_date_time_idx'),
+        ]
         ordering = ['date', 'time']
 
     def save(self, *args, **kwargs):
@@ -238,13 +265,128 @@ class Prescription(models.Model):
     ]
 
     patient = models.ForeignKey(User, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='prescriptions/')
+    image = models.ImageField(upload_to='prescriptions/', storage=upload_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     doctor = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, blank=True, related_name='checked_prescriptions')
     doctor_notes = models.TextField(blank=True, null=True)
     # Link only to the items that need a prescription
     products = models.ManyToManyField('Product', blank=True, related_name='prescriptions')
+    pet_products = models.ManyToManyField('PetProduct', blank=True, related_name='prescriptions')
+
+    # Review queue lease: a pending prescription is worked on by one doctor
+    # at a time and goes back to the queue when the lease runs out.
+    claimed_by = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_prescriptions')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'status'], name='rx_patient_status_idx'),
+            models.Index(fields=['patient', '-uploaded_at'], name='rx_patient_uploaded_idx'),
+            models.Index(fields=['status', 'uploaded_at'], name='rx_status_uploaded_idx'),
+            models.Index(fields=['claimed_by', 'lease_expires_at'], name='rx_claim_lease_idx'),
+        ]
+
+    @classmethod
+    def claimable(cls, now=None):
+        """Pending prescriptions nobody holds a live lease on, oldest first."""
+        now = now or timezone.now()
+        return (cls.objects
+                .filter(status='pending')
+                .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now))
+                .order_by('uploaded_at'))
+
+    @classmethod
+    def leased_to(cls, doctor, now=None):
+        """Pending prescriptions ``doctor`` holds a live lease on."""
+        return cls.objects.filter(status='pending', claimed_by=doctor,
+                                  lease_expires_at__gt=now or timezone.now())
+
+    @classmethod
+    def claim_batch(cls, doctor, size=None, lease_minutes=None):
+        """
+        Lease up to ``size`` pending prescriptions to ``doctor`` and return the
+        doctor's live leases (renewed). The claim is a single UPDATE whose
+        WHERE clause re-checks claimability, so two doctors can never take the
+        same row; on backends with SKIP LOCKED the candidate rows are locked too.
+        """
+        size = size or settings.PRESCRIPTION_CLAIM_BATCH
+        lease = timedelta(minutes=lease_minutes or settings.PRESCRIPTION_LEASE_MINUTES)
+        now = timezone.now()
+
+        with transaction.atomic():
+            held = cls.leased_to(doctor, now)
+            held.update(lease_expires_at=now + lease)
+            wanted = size - held.count()
+
+            if wanted > 0:
+                candidates = cls.claimable(now)
+                if connection.features.has_select_for_update_skip_locked:
+                    candidates = candidates.select_for_update(skip_locked=True)
+                ids = list(candidates.values_list('pk', flat=True)[:wanted])
+                (cls.claimable(now)
+                 .filter(pk__in=ids)
+                 .update(claimed_by=doctor, lease_expires_at=now + lease))
+
+        return (cls.leased_to(doctor, now)
+                .select_related('patient')
+                .order_by('uploaded_at'))
+
+    @classmethod
+    def release_claims(cls, doctor):
+        """Hand a doctor's unfinished leases back to the queue."""
+        return (cls.objects
+                .filter(status='pending', claimed_by=doctor)
+                .update(claimed_by=None, lease_expires_at=None))
+
+    @classmethod
+    def moderate(cls, ids, doctor, status, notes=''):
+        """
+        Approve or reject many prescriptions at once. Only pending ones that
+        are not leased to another doctor are touched. Rejections remove the
+        prescription items from the patients' carts. Everything runs as
+        set-based statements in one transaction, so the number of queries
+        does not depend on len(ids).
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            eligible = list(
+                cls.objects
+                .filter(pk__in=ids, status='pending')
+                .filter(Q(claimed_by=doctor) | Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now))
+                .values_list('pk', flat=True)
+            )
+            if not eligible:
+                return []
+
+            cls.objects.filter(pk__in=eligible).update(
+                status=status, doctor=doctor, doctor_notes=notes,
+                claimed_by=None, lease_expires_at=None,
+            )
+
+            if status == 'rejected':
+                rejected_products = cls.products.through.objects.filter(
+                    prescription_id__in=eligible,
+                    product_id=OuterRef('product_id'),
+                    prescription__patient_id=OuterRef('cart__user_id'),
+                )
+                rejected_pet_products = cls.pet_products.through.objects.filter(
+                    prescription_id__in=eligible,
+                    petproduct_id=OuterRef('pet_product_id'),
+                    prescription__patient_id=OuterRef('cart__user_id'),
+                )
+                # One DELETE: nothing listens to CartItem deletes, so Django
+                # fast-deletes instead of loading the rows
+                CartItem.objects.filter(
+                    Q(Exists(rejected_products), product__requires_prescription=True) |
+                    Q(Exists(rejected_pet_products), pet_product__prescription_required=True)
+                ).delete()
+        return eligible
+
+    def is_claimable_by(self, doctor):
+        return (self.claimed_by_id in (None, doctor.pk)
+                or self.lease_expires_at is None
+                or self.lease_expires_at <= timezone.now())
 
     def __str__(self):
         return f"{self.patient.username} - {self.status}"
@@ -275,13 +417,123 @@ class PetProduct(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     prescription_required = models.BooleanField(default=False)
     image = models.ImageField(upload_to='pet_products/', blank=True, null=True)
+    # Blank = stock not tracked for this item (it is never held or decremented)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+
+    @property
+    def sku_code(self):
+        return Sku.code_for(Sku.KIND_PET, self.pk)
 
     def __str__(self):
         return self.name
 
+
+# -------------------- SKU --------------------
+class Sku(models.Model):
+    """
+    One row per sellable item across both catalogs. ``code`` is the single
+    indexed key that cart and order rows resolve against, so a cart
+    operation never has to probe Product and PetProduct separately.
+    """
+    KIND_MEDICINE = 'med'
+    KIND_PET = 'pet'
+    KIND_CHOICES = [
+        (KIND_MEDICINE, 'Medicine'),
+        (KIND_PET, 'Pet product'),
+    ]
+
+    code = models.CharField(max_length=20, unique=True)
+    kind = models.CharField(max_length=3, choices=KIND_CHOICES)
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, null=True, blank=True, related_name='sku'
+    )
+    pet_product = models.OneToOneField(
+        PetProduct, on_delete=models.CASCADE, null=True, blank=True, related_name='sku'
+    )
+
+    class Meta:
+        verbose_name = 'SKU'
+        constraints = [
+            CheckConstraint(
+                check=(Q(kind='med', product__isnull=False, pet_product__isnull=True) |
+                       Q(kind='pet', product__isnull=True, pet_product__isnull=False)),
+                name='sku_exactly_one_item',
+            ),
+        ]
+
+    @staticmethod
+    def code_for(kind, pk):
+        return f"{kind.upper()}-{pk}"
+
+    @classmethod
+    def for_item(cls, item):
+        """Return (creating if needed) the SKU row of a Product or PetProduct."""
+        if isinstance(item, Product):
+            kind, lookup = cls.KIND_MEDICINE, {'product': item}
+        else:
+            kind, lookup = cls.KIND_PET, {'pet_product': item}
+        sku, _ = cls.objects.get_or_create(
+            code=cls.code_for(kind, item.pk), defaults={'kind': kind, **lookup}
+        )
+        return sku
+
+    @classmethod
+    def resolve(cls, code):
+        """
+        The SKU with ``code``, or None. Catalog rows that never got their SKU
+        (bulk_create, raw fixtures) get it here, the first time their
+        ``sku_code`` link is followed.
+        """
+        sku = cls.objects.select_related('product', 'pet_product').filter(code=code).first()
+        if sku is not None:
+            return sku
+        kind, _, pk = code.partition('-')
+        model = {cls.KIND_MEDICINE: Product, cls.KIND_PET: PetProduct}.get(kind.lower())
+        item = model.objects.filter(pk=pk).first() if model and pk.isdigit() else None
+        return cls.for_item(item) if item is not None else None
+
+    @property
+    def item(self):
+        return self.product if self.kind == self.KIND_MEDICINE else self.pet_product
+
+    @property
+    def name(self):
+        return self.item.name
+
+    @property
+    def price(self):
+        return self.item.price
+
+    @property
+    def requires_prescription(self):
+        if self.kind == self.KIND_MEDICINE:
+            return self.product.requires_prescription
+        return self.pet_product.prescription_required
+
+    def __str__(self):
+        return self.code
+
+class SkuNeighbours(models.Model):
+    """
+    Precomputed "frequently bought together" list for one SKU, written by
+    manage.py build_recommendations: ``neighbours`` is [[sku_id, score], ...]
+    best first, so serving is one primary-key lookup.
+    """
+    sku = models.OneToOneField(Sku, on_delete=models.CASCADE, primary_key=True, related_name='neighbours')
+    neighbours = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'SKU neighbours'
+
+    def __str__(self):
+        return f"{len(self.neighbours)} neighbours of {self.sku_id}"
+
+
 # -------------------- CART & CART ITEM --------------------
 class Cart(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # One cart per user, enforced by the unique index behind OneToOneField
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def total_price(self):
@@ -307,7 +559,17 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey('Product', null=True, blank=True, on_delete=models.CASCADE)
     pet_product = models.ForeignKey('PetProduct', null=True, blank=True, on_delete=models.CASCADE)
+    sku = models.ForeignKey(Sku, null=True, blank=True, on_delete=models.CASCADE, related_name='cart_items')
     quantity = models.PositiveIntegerField(default=1)
+    # Last time the shopper touched this line; used to find abandoned carts
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cart', 'sku'], name='cartitem_cart_sku_idx'),
+            models.Index(fields=['cart', 'product'], name='cartitem_cart_product_idx'),
+            models.Index(fields=['cart', 'pet_product'], name='cartitem_cart_petproduct_idx'),
+        ]
 
     @property
     def subtotal(self):
@@ -326,6 +588,7 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     pet_product = models.ForeignKey('PetProduct', on_delete=models.SET_NULL, null=True, blank=True)
+    sku = models.ForeignKey(Sku, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_items')
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
     name = models.CharField(max_length=255, blank=True, null=False)  # store name at order time
@@ -348,6 +611,121 @@ class OrderItem(models.Model):
         return f"{self.name} x {self.quantity}"
 
 
+# -------------------- STOCK HOLDS --------------------
+class StockHold(models.Model):
+    """
+    Units set aside for a cart while its owner is on the checkout page
+    (see main/stock.py). Other buyers see ``stock`` minus unexpired holds;
+    placing the order turns the hold into a stock decrement. Expired holds
+    are ignored right away and deleted by manage.py release_stock_holds.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='stock_holds')
+    sku = models.ForeignKey(Sku, on_delete=models.CASCADE, related_name='stock_holds')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('cart', 'sku'), name='uniq_hold_cart_sku'),
+        ]
+        indexes = [
+            models.Index(fields=['sku', 'expires_at'], name='hold_sku_expires_idx'),
+            models.Index(fields=['expires_at'], name='hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.sku.code} until {self.expires_at:%H:%M}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger. With STOCK_LEDGER on, orders add ``sale`` rows
+    instead of updating the product row, so concurrent checkouts of one SKU
+    never contend on it. The current level is the catalog ``stock`` (the
+    compacted balance) plus the sum of uncompacted movements.
+    manage.py compact_stock_ledger folds those into ``stock`` from time to
+    time. With it off, movements are applied as they are saved and stored
+    already compacted, as a history.
+    """
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('return', 'Return'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    sku = models.ForeignKey(Sku, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    # Signed: receipts and returns add stock, sales take it away
+    quantity = models.IntegerField()
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    compacted = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sku'], name='stockmove_pending_idx', condition=Q(compacted=False)),
+            models.Index(fields=['sku', '-created_at'], name='stockmove_sku_created_idx'),
+        ]
+
+    # Sign each kind's quantity must have; adjustments go either way
+    KIND_SIGNS = {'receipt': 1, 'return': 1, 'sale': -1}
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.sku.code}"
+
+    def clean(self):
+        sign = self.KIND_SIGNS.get(self.kind)
+        if self.quantity == 0:
+            raise ValidationError({'quantity': "Quantity cannot be zero."})
+        if sign and self.quantity is not None and self.quantity * sign < 0:
+            raise ValidationError({'quantity': f"A {self.get_kind_display().lower()} must be "
+                                               f"{'positive' if sign > 0 else 'negative'}."})
+
+
+# -------------------- ORDER ARCHIVE --------------------
+class ArchivedOrder(models.Model):
+    """
+    Delivered/cancelled orders moved out of the hot Order table by the
+    ``archive_orders`` command. Keeps the original order id and is only
+    read when a customer asks for their older history.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    is_paid = models.BooleanField(default=False)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    payment_method = models.CharField(max_length=30, choices=Order.PAYMENT_METHOD_CHOICES)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archorder_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.pk} by {self.user.username}"
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    sku_code = models.CharField(max_length=20, blank=True)
+    name = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.name} x {self.quantity}"
+
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -374,16 +752,177 @@ class eLabSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Report
-    report_file = models.FileField(upload_to='elab_reports/', null=True, blank=True)
+    report_file = models.FileField(upload_to='elab_reports/', storage=upload_storage, null=True, blank=True)
     report_verified = models.BooleanField(default=False)
 
     # Payment
     is_paid = models.BooleanField(default=False)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, blank=True, null=True)
     transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='elab_user_created_idx'),
+            # Lab console: schedule order, and each filter narrowed by date
+            models.Index(fields=['preferred_date', 'preferred_time'], name='elab_date_time_idx'),
+            models.Index(fields=['test_type', 'preferred_date'], name='elab_type_date_idx'),
+            models.Index(fields=['is_paid', 'preferred_date'], name='elab_paid_date_idx'),
+            models.Index(fields=['report_verified', 'preferred_date'], name='elab_verified_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.test_name} ({self.test_type}) for {self.user.username} on {self.preferred_date}"
+
+
+# -------------------- UPLOAD STORAGE --------------------
+class MediaBlob(models.Model):
+    """
+    One physical file in the content-addressed upload storage and the number
+    of rows that point at it (see main/storage.py).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+# -------------------- CALENDAR FEEDS --------------------
+def _new_feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """
+    Secret token behind a user's .ics subscription URL. Calendar apps cannot
+    log in, so the token is the credential; regenerating it revokes old links.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True, default=_new_feed_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed for {self.user.username}"
+
+    @classmethod
+    def for_user(cls, user):
+        feed, _ = cls.objects.get_or_create(user=user)
+        return feed
+
+    def regenerate(self):
+        self.token = _new_feed_token()
+        self.save(update_fields=['token'])
+
+
+# -------------------- NOTIFICATIONS --------------------
+class Notification(models.Model):
+    """
+    Outbox row written in the same transaction as the change it reports
+    (see main/notifications.py). manage.py send_notifications delivers
+    pending rows as one digest email per recipient.
+    """
+    KIND_CHOICES = [
+        ('appointment', 'Appointment booked'),
+        ('order', 'Order placed'),
+        ('prescription', 'Prescription reviewed'),
+        ('elab_report', 'eLab report uploaded'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # The dispatcher only ever reads undelivered rows
+            models.Index(fields=['recipient', 'created_at'], name='notif_pending_idx',
+                         condition=Q(sent_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.recipient.username}"
+
+
+# -------------------- SALES ROLLUPS --------------------
+class DailySales(models.Model):
+    """
+    Non-cancelled orders and their revenue per day and payment method.
+    Written only by manage.py build_sales_rollups; the staff dashboard
+    reads these instead of scanning orders.
+    """
+    day = models.DateField()
+    payment_method = models.CharField(max_length=30)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('day', 'payment_method'), name='uniq_dailysales_day_method'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method}: {self.revenue}"
+
+
+class DailyItemSales(models.Model):
+    """Units and revenue per day and SKU, with the SKU's category and Rx flag copied in."""
+    day = models.DateField()
+    sku_code = models.CharField(max_length=20, blank=True)
+    name = models.CharField(max_length=255)
+    category = models.CharField(max_length=255)
+    prescription = models.BooleanField(default=False)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('day', 'sku_code'), name='uniq_dailyitemsales_day_sku'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.sku_code or self.name}: {self.quantity}"
+
+
+class RollupWatermark(models.Model):
+    """Newest source change a rollup command has already folded in."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+# -------------------- DOCTOR OCCUPANCY --------------------
+class DoctorOccupancy(models.Model):
+    """
+    Weekly occupancy matrices for one doctor, written by
+    manage.py build_occupancy. Each matrix is 7 weekdays (Monday first)
+    x 24 hours: ``capacity`` is bookable slots per week from Schedule,
+    ``booked`` the average appointments per week over the last ``weeks``
+    weeks, and ``forecast`` the expected appointments next week.
+    """
+    doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, primary_key=True, related_name='occupancy')
+    weeks = models.PositiveSmallIntegerField()
+    capacity = models.JSONField(default=list)
+    booked = models.JSONField(default=list)
+    forecast = models.JSONField(default=list)
+    # [[kind, weekday, hour, forecast, capacity], ...]; kind is 'add', 'trim' or 'unscheduled'
+    suggestions = models.JSONField(default=list)
+    utilization = models.FloatField(default=0)
+    saturated_hours = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'doctor occupancy'
+
+    def __str__(self):
+        return f"{self.doctor.name}: {self.utilization:.0%} booked"
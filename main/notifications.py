@@ -0,0 +1,64 @@
+# main/notifications.py
+"""
+Outbox writers for user-facing notifications.
+
+Call these inside the same ``transaction.atomic()`` block as the change they
+describe. The notification is then committed (or rolled back) together with
+the booking, order or review, and the request only pays for one INSERT.
+Delivery happens later in ``manage.py send_notifications``.
+"""
+
+from .models import Notification, Prescription
+
+
+def _enqueue(recipient, kind, subject, body):
+    if recipient is not None:
+        Notification.objects.create(recipient=recipient, kind=kind, subject=subject, body=body)
+
+
+def appointment_booked(appointment):
+    when = f"{appointment.date} at {appointment.time}"
+    patient = appointment.patient
+    _enqueue(
+        patient, 'appointment',
+        f"Appointment booked with {appointment.doctor.name}",
+        f"Your appointment with {appointment.doctor.name} ({appointment.get_visit_type_display()}) is on {when}."
+        + (f"\nMeeting link: {appointment.meeting_link}" if appointment.meeting_link else ''),
+    )
+    who = appointment.patient_name or (patient.username if patient else 'A guest')
+    _enqueue(
+        appointment.doctor.user, 'appointment',
+        f"New appointment on {appointment.date}",
+        f"{who} booked an appointment ({appointment.get_visit_type_display()}) on {when}.",
+    )
+
+
+def order_placed(order):
+    _enqueue(
+        order.user, 'order',
+        f"Order #{order.id} received",
+        f"We received your order #{order.id} for ৳{order.total_price} ({order.payment_method}).",
+    )
+
+
+def prescriptions_reviewed(ids, status):
+    """One row per prescription in ``ids``, which ``Prescription.moderate`` just decided."""
+    rows = (Prescription.objects.filter(pk__in=ids)
+            .values_list('pk', 'patient_id', 'doctor__name', 'doctor_notes'))
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=patient_id, kind='prescription',
+            subject=f"Prescription #{pk} {status}",
+            body=f"Your prescription #{pk} was {status} by {doctor_name}."
+                 + (f"\nNotes: {notes}" if notes else ''),
+        )
+        for pk, patient_id, doctor_name, notes in rows
+    ])
+
+
+def elab_report_uploaded(booking):
+    _enqueue(
+        booking.user, 'elab_report',
+        f"Your {booking.test_name} report is ready",
+        f"The report for your {booking.test_name} test ({booking.preferred_date}) has been uploaded.",
+    )
@@ -0,0 +1,145 @@
+# main/queries.py
+"""
+Querysets behind the busiest pages, shared by main/views.py and
+manage.py audit_query_plans, so the audit explains exactly what the views
+run.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Appointment, ArchivedOrder, CartItem, Doctor, Order, PetProduct, Prescription,
+    Product, eLabSchedule,
+)
+
+
+# -------------------- CART --------------------
+
+def cart_line(user, sku_code):
+    return CartItem.objects.filter(cart__user=user, sku__code=sku_code)
+
+
+def approved_prescription_products(user, product_ids):
+    """The ``product_ids`` the user holds an approved prescription for (count() it)."""
+    return (Prescription.objects
+            .filter(patient=user, status='approved', products__in=product_ids)
+            .values('products')
+            .distinct())
+
+
+# -------------------- CATALOG --------------------
+
+def name_search(model, query):
+    return model.objects.filter(name__icontains=query)
+
+
+def catalog_search(query):
+    return name_search(Product, query), name_search(PetProduct, query)
+
+
+# -------------------- APPOINTMENTS & DASHBOARDS --------------------
+
+def slot_taken(doctor, date, time):
+    return Appointment.objects.filter(doctor=doctor, date=date, time=time)
+
+
+def doctor_appointments(doctor):
+    return Appointment.objects.filter(doctor=doctor).order_by('date', 'time')
+
+
+def patient_history(user):
+    """The patient dashboard's querysets by name."""
+    return {
+        'prescriptions': Prescription.objects.filter(patient=user).order_by('-uploaded_at'),
+        'orders': Order.objects.filter(user=user).order_by('-created_at'),
+        'appointments': Appointment.objects.filter(patient=user).order_by('date', 'time'),
+        'elab_schedules': eLabSchedule.objects.filter(user=user),
+    }
+
+
+# -------------------- MANAGE USERS --------------------
+
+def _count_per_user(model, field):
+    """Correlated COUNT of ``model`` rows whose ``field`` is the outer user."""
+    rows = (model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(n=Count('pk')).values('n'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def user_directory(filters):
+    """
+    manage_users rows for ``filters`` (q, role, active, joined_from,
+    joined_to), newest first, with per-user activity counts.
+    """
+    users = User.objects.all()
+    if filters.get('q'):
+        q = filters['q']
+        users = users.filter(Q(username__icontains=q) | Q(email__icontains=q)
+                             | Q(first_name__icontains=q) | Q(last_name__icontains=q))
+    if filters.get('role') == 'staff':
+        users = users.filter(is_staff=True)
+    elif filters.get('role') in ('doctor', 'patient'):
+        # Same rule as the is_doctor context flag. Doctors are few, so their
+        # ids go in as a literal list instead of a per-row EXISTS over every user.
+        doctor_ids = set(Doctor.objects.filter(user__isnull=False).values_list('user_id', flat=True))
+        doctor_ids |= set(User.objects.filter(groups__name='Doctors').values_list('pk', flat=True))
+        if filters['role'] == 'doctor':
+            users = users.filter(pk__in=doctor_ids)
+        else:
+            users = users.exclude(pk__in=doctor_ids).filter(is_staff=False)
+    if filters.get('active') in ('yes', 'no'):
+        users = users.filter(is_active=filters['active'] == 'yes')
+    # Plain datetime bounds; __date would run a conversion on every row
+    tz = timezone.get_current_timezone()
+    if filters.get('joined_from'):
+        users = users.filter(date_joined__gte=datetime.combine(filters['joined_from'], time.min, tzinfo=tz))
+    if filters.get('joined_to'):
+        users = users.filter(date_joined__lt=datetime.combine(filters['joined_to'] + timedelta(days=1), time.min, tzinfo=tz))
+
+    # Newest first by primary key, which follows join order and is indexed.
+    # The counts are correlated subqueries, so only the page's rows pay for
+    # them and the paginator's COUNT(*) skips them.
+    return (users.order_by('-pk')
+            .annotate(
+                order_count=_count_per_user(Order, 'user') + _count_per_user(ArchivedOrder, 'user'),
+                appointment_count=_count_per_user(Appointment, 'patient'),
+                prescription_count=_count_per_user(Prescription, 'patient'),
+                has_doctor_profile=Exists(Doctor.objects.filter(user=OuterRef('pk'))),
+            ))
+
+
+# -------------------- LAB CONSOLE --------------------
+
+def lab_bookings(filters, day):
+    """
+    (bookings, by_type) for the lab console: the page's rows for ``day``
+    (None for every date) and the paid/verified filters, and the same rows
+    narrowed by test type only, for the per-day counters.
+    """
+    tests = eLabSchedule.objects.all()
+    if filters.get('test_type') in dict(eLabSchedule.TEST_TYPE_CHOICES):
+        tests = tests.filter(test_type=filters['test_type'])
+    by_type = tests
+    if day:
+        tests = tests.filter(preferred_date=day)
+    if filters.get('paid') in ('yes', 'no'):
+        tests = tests.filter(is_paid=filters['paid'] == 'yes')
+    if filters.get('verified') in ('yes', 'no'):
+        tests = tests.filter(report_verified=filters['verified'] == 'yes')
+    return tests.select_related('user').order_by('preferred_date', 'preferred_time', 'pk'), by_type
+
+
+def lab_day_counts(by_type, first, last):
+    """One row per day in [first, last]: total, paid, reported, verified."""
+    has_report = Q(report_file__isnull=False) & ~Q(report_file='')
+    return (by_type.filter(preferred_date__range=(first, last))
+            .order_by().values('preferred_date')
+            .annotate(total=Count('pk'),
+                      paid=Count('pk', filter=Q(is_paid=True)),
+                      reported=Count('pk', filter=has_report),
+                      verified=Count('pk', filter=Q(report_verified=True))))
@@ -0,0 +1,60 @@
+# main/recommendations.py
+"""
+"Frequently bought together" lookups.
+
+manage.py build_recommendations precomputes each SKU's top neighbours from
+order history into SkuNeighbours. Serving is one indexed fetch of the seed
+rows plus one fetch of the suggested SKUs, whatever the order volume.
+Several seeds (a cart, a category page) are merged by summing scores.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Sku, SkuNeighbours
+
+
+def _seed_neighbours(product_ids, pet_product_ids):
+    seeds = Q(sku__product_id__in=product_ids) | Q(sku__pet_product_id__in=pet_product_ids)
+    return SkuNeighbours.objects.filter(seeds).values_list('neighbours', flat=True)
+
+
+def _scores(neighbour_lists):
+    scores = defaultdict(float)
+    for neighbours in neighbour_lists:
+        for sku_id, score in neighbours:
+            scores[sku_id] += score
+    return scores
+
+
+def _suggested_skus(scores, product_ids, pet_product_ids, limit):
+    # Over-fetch so dropping seed items still leaves ``limit`` suggestions
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit * 3]
+    return (Sku.objects.filter(pk__in=ranked)
+            .exclude(product_id__in=product_ids)
+            .exclude(pet_product_id__in=pet_product_ids)
+            .select_related('product', 'pet_product'))
+
+
+def recommend(product_ids=(), pet_product_ids=(), limit=None):
+    """Skus most often bought with the given items, excluding the items themselves."""
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    product_ids, pet_product_ids = list(product_ids), list(pet_product_ids)
+    scores = _scores(_seed_neighbours(product_ids, pet_product_ids))
+    if not scores:
+        return []
+    skus = _suggested_skus(scores, product_ids, pet_product_ids, limit)
+    return sorted(skus, key=lambda sku: -scores[sku.pk])[:limit]
+
+
+async def arecommend(product_ids=(), pet_product_ids=(), limit=None):
+    """recommend() for async views, with the async ORM."""
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    product_ids, pet_product_ids = list(product_ids), list(pet_product_ids)
+    scores = _scores([n async for n in _seed_neighbours(product_ids, pet_product_ids)])
+    if not scores:
+        return []
+    skus = [sku async for sku in _suggested_skus(scores, product_ids, pet_product_ids, limit)]
+    return sorted(skus, key=lambda sku: -scores[sku.pk])[:limit]
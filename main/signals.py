@@ -0,0 +1,122 @@
+# main/signals.py
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_model_version
+from .db import apply_sqlite_pragmas
+from .fuzzy import index as fuzzy_index
+from .models import (
+    Appointment, Category, Doctor, PetCategory, PetProduct, Prescription, Product,
+    Schedule, Sku, eLabSchedule,
+)
+from .suggest import index as suggest_index
+
+
+# -------------------- DATABASE --------------------
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='main.apply_sqlite_pragmas')
+
+
+# -------------------- SKU --------------------
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=PetProduct)
+def ensure_sku(sender, instance, created, raw=False, **kwargs):
+    # Every catalog row gets its SKU at creation time so cart lookups
+    # never need to fall back to the per-catalog tables.
+    if created and not raw:
+        Sku.for_item(instance)
+
+
+# -------------------- UPLOAD REFERENCES --------------------
+
+# Fields stored in the content-addressed upload storage. A row dropping or
+# replacing its file releases one reference on the shared blob.
+UPLOAD_FIELDS = {
+    Prescription: 'image',
+    Appointment: 'prescription_file',
+    eLabSchedule: 'report_file',
+}
+
+
+def _release(storage, name):
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+def release_replaced_upload(sender, instance, raw=False, **kwargs):
+    field = UPLOAD_FIELDS[sender]
+    if raw or not instance.pk:
+        return
+    current = getattr(instance, field)
+    if current and current._committed:
+        return  # file untouched by this save
+    old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if old and old != getattr(instance, field).name:
+        _release(sender._meta.get_field(field).storage, old)
+
+
+def release_deleted_upload(sender, instance, **kwargs):
+    field = UPLOAD_FIELDS[sender]
+    _release(sender._meta.get_field(field).storage, getattr(instance, field).name)
+
+
+# Connected per model: a receiver without a sender would make every model's
+# bulk delete load its rows and send signals one by one (no fast delete).
+for model in UPLOAD_FIELDS:
+    pre_save.connect(release_replaced_upload, sender=model)
+    post_delete.connect(release_deleted_upload, sender=model)
+
+
+# -------------------- FRAGMENT CACHE --------------------
+
+# Model -> version counter used in {% cache %} keys
+FRAGMENT_VERSIONS = {
+    Category: 'category',
+    Product: 'product',
+    PetCategory: 'petcategory',
+    PetProduct: 'petproduct',
+    Doctor: 'doctor',
+    Schedule: 'doctor',
+}
+
+
+def bump_fragment_version(sender, raw=False, **kwargs):
+    # On commit: a reader that sees the new version must also see the new rows
+    if not raw:
+        name = FRAGMENT_VERSIONS[sender]
+        transaction.on_commit(lambda: bump_model_version(name))
+
+
+for model in FRAGMENT_VERSIONS:
+    post_save.connect(bump_fragment_version, sender=model)
+    post_delete.connect(bump_fragment_version, sender=model)
+
+
+# -------------------- SEARCH INDEXES --------------------
+
+# In-process indexes patched once the change commits, after the version
+# bump above (connected first); each ignores models it does not cover
+SEARCH_INDEXES = (suggest_index, fuzzy_index)
+SEARCH_MODELS = (Product, PetProduct, Doctor)
+
+
+def _patch_search_indexes(method, instance):
+    for index in SEARCH_INDEXES:
+        getattr(index, method)(instance)
+
+
+def update_search_indexes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: _patch_search_indexes('saved', instance))
+
+
+def drop_from_search_indexes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _patch_search_indexes('deleted', instance))
+
+
+for model in SEARCH_MODELS:
+    post_save.connect(update_search_indexes, sender=model)
+    post_delete.connect(drop_from_search_indexes, sender=model)
@@ -0,0 +1,235 @@
+# main/stock.py
+"""
+Stock reservations and the stock ledger.
+
+reserve() runs when the checkout page renders. It holds the cart's
+quantities for STOCK_HOLD_MINUTES, so another buyer cannot take the last
+units while this one is paying. consume() runs inside the order
+transaction: it re-checks the level against other carts' holds, then
+records the sale.
+
+How a sale is recorded depends on STOCK_LEDGER. Off (the default), the
+catalog ``stock`` column is decremented in place, and staff movements are
+applied to it as they are saved. On, ``sale`` rows are appended to the
+StockMovement ledger and a SKU's level is its catalog ``stock`` (the
+compacted balance) plus its uncompacted movements; compact() folds those
+into ``stock`` in short batches. The ledger's check locks no catalog row,
+so it relies on the database running one write transaction at a time, as
+SQLite does. Pet products with a blank ``stock`` are not tracked.
+
+A balance that would go negative is clamped at zero, logged as an error
+and balanced by an ``adjustment`` noted OVERSOLD_NOTE, so oversells can be
+counted in the admin.
+"""
+
+import logging
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import CartItem, PetProduct, Product, Sku, StockHold, StockMovement
+
+logger = logging.getLogger('medimart.stock')
+
+OVERSOLD_NOTE = "oversold: clamped at 0"
+
+
+class InsufficientStock(Exception):
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"Not enough stock for: {', '.join(names)}")
+
+
+def _attach_skus(items):
+    """
+    Give cart lines saved without a SKU (added in the admin, or missed by
+    the backfill) their catalog row's SKU, on the objects and in the table,
+    so holds, sales and order items all carry it.
+    """
+    for item in items:
+        if item.sku_id is None and (item.product_id or item.pet_product_id):
+            item.sku = Sku.for_item(item.product or item.pet_product)
+            CartItem.objects.filter(pk=item.pk).update(sku=item.sku)
+
+
+def _wanted(items):
+    """sku_id -> quantity for the tracked items in a cart."""
+    _attach_skus(items)
+    wanted = defaultdict(int)
+    for item in items:
+        if item.product_id or (item.pet_product_id and item.pet_product.stock is not None):
+            wanted[item.sku_id] += item.quantity
+    return wanted
+
+
+def _pending(sku_ids):
+    """sku_id -> net uncompacted ledger quantity."""
+    rows = (StockMovement.objects
+            .filter(sku_id__in=sku_ids, compacted=False)
+            .values('sku_id')
+            .annotate(delta=Sum('quantity')))
+    return {row['sku_id']: row['delta'] for row in rows}
+
+
+def _levels(sku_ids, lock=True):
+    """sku_id -> (model, pk, level, name); ``lock`` locks the catalog rows."""
+    levels = {}
+    for model in (Product, PetProduct):
+        rows = model.objects.filter(sku__pk__in=sku_ids, stock__isnull=False)
+        if lock:
+            rows = rows.select_for_update()
+        for sku_id, pk, stock, name in rows.values_list('sku__pk', 'pk', 'stock', 'name'):
+            levels[sku_id] = (model, pk, stock, name)
+    pending = _pending(sku_ids)
+    return {sku_id: (model, pk, stock + pending.get(sku_id, 0), name)
+            for sku_id, (model, pk, stock, name) in levels.items()}
+
+
+def available(sku_ids):
+    """sku_id -> units free for new buyers (level minus unexpired holds)."""
+    held = _held_by_others(None, sku_ids, timezone.now())
+    return {sku_id: max(level - held.get(sku_id, 0), 0)
+            for sku_id, (_, _, level, _) in _levels(sku_ids, lock=False).items()}
+
+
+def _held_by_others(cart, sku_ids, now):
+    holds = StockHold.objects.filter(sku_id__in=sku_ids, expires_at__gt=now)
+    if cart is not None:
+        holds = holds.exclude(cart=cart)
+    rows = holds.values('sku_id').annotate(held=Sum('quantity'))
+    return {row['sku_id']: row['held'] for row in rows}
+
+
+# Callers read holds before levels: a sale committed in between then shows
+# up as both a hold and a movement, which errs on the side of "sold out".
+def _shortages(wanted, levels, held):
+    return {sku_id for sku_id, quantity in wanted.items()
+            if levels[sku_id][2] - held.get(sku_id, 0) < quantity}
+
+
+def reserve(cart, items):
+    """
+    (Re)place this cart's holds. Returns the names of items that cannot be
+    held; nothing is held for those, the rest are.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=settings.STOCK_HOLD_MINUTES)
+    wanted = _wanted(items)
+
+    with transaction.atomic():
+        StockHold.objects.filter(cart=cart).delete()
+        if not wanted:
+            return []
+        held = _held_by_others(cart, list(wanted), now)
+        levels = _levels(list(wanted))
+        short = _shortages(wanted, levels, held)
+        StockHold.objects.bulk_create([
+            StockHold(cart=cart, sku_id=sku_id, quantity=quantity, expires_at=expires_at)
+            for sku_id, quantity in wanted.items() if sku_id not in short
+        ])
+    return [levels[sku_id][3] for sku_id in short]
+
+
+def consume(cart, items, order):
+    """
+    Record the sale of a cart's tracked items for ``order``; call inside the
+    order's transaction. Raises InsufficientStock (rolling the order back)
+    if the stock has gone meanwhile. The level is always re-read: even a
+    live hold can be undercut by a negative adjustment. Only the in-place
+    decrement locks the catalog rows.
+    """
+    now = timezone.now()
+    wanted = _wanted(items)
+    if wanted:
+        held = _held_by_others(cart, list(wanted), now)
+        levels = _levels(list(wanted), lock=not settings.STOCK_LEDGER)
+        short = _shortages(wanted, levels, held)
+        if short:
+            raise InsufficientStock([levels[sku_id][3] for sku_id in short])
+        if settings.STOCK_LEDGER:
+            StockMovement.objects.bulk_create([
+                StockMovement(sku_id=sku_id, kind='sale', quantity=-quantity, order=order)
+                for sku_id, quantity in wanted.items()
+            ])
+        else:
+            for sku_id, quantity in wanted.items():
+                model, pk, _, _ = levels[sku_id]
+                model.objects.filter(pk=pk).update(stock=F('stock') - quantity)
+    StockHold.objects.filter(cart=cart).delete()
+
+
+def record_movement(sku, kind, quantity, note=''):
+    """Add a receipt, return or adjustment; ``quantity`` is signed."""
+    movement = StockMovement(sku=sku, kind=kind, quantity=quantity, note=note)
+    movement.clean()
+    return save_movement(movement)
+
+
+def save_movement(movement):
+    """
+    Save a new staff movement. Without STOCK_LEDGER it is applied to the
+    catalog stock at once and saved as already compacted.
+    """
+    with transaction.atomic():
+        if not settings.STOCK_LEDGER:
+            _apply({movement.sku_id: movement.quantity})
+            movement.compacted = True
+        movement.save()
+    return movement
+
+
+def _apply(deltas):
+    """
+    Add sku_id -> delta to the catalog stock columns, one UPDATE per SKU.
+    A balance that would go negative is clamped at zero rather than failing
+    the stock CHECK constraint; returns the number of SKUs clamped.
+    """
+    oversold = []
+    for model in (Product, PetProduct):
+        for sku_id, pk, stock in model.objects.filter(sku__pk__in=deltas).values_list('sku__pk', 'pk', 'stock'):
+            delta = deltas[sku_id]
+            if not delta:
+                continue
+            if (stock or 0) + delta < 0:
+                logger.error("stock of %s %s would go to %d; clamped at 0",
+                             model.__name__, pk, (stock or 0) + delta)
+                oversold.append(StockMovement(sku_id=sku_id, kind='adjustment', quantity=-((stock or 0) + delta),
+                                              note=OVERSOLD_NOTE, compacted=True))
+            model.objects.filter(pk=pk).update(stock=Greatest(Coalesce(F('stock'), 0) + delta, 0))
+    StockMovement.objects.bulk_create(oversold)
+    return len(oversold)
+
+
+def compact(batch_size=5000):
+    """
+    Fold one batch of uncompacted movements into the catalog ``stock``
+    columns: one UPDATE per SKU that moved. Works on an explicit id list so
+    rows committed meanwhile are left for the next batch. Returns the
+    number of movements folded and of SKUs clamped at zero.
+    """
+    with transaction.atomic():
+        ids = list(StockMovement.objects.filter(compacted=False)
+                   .order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0, 0
+        batch = StockMovement.objects.filter(pk__in=ids)
+        deltas = dict(batch.values('sku_id').annotate(delta=Sum('quantity'))
+                      .values_list('sku_id', 'delta'))
+        clamped = _apply(deltas)
+        batch.update(compacted=True)
+    return len(ids), clamped
+
+
+def release_expired(batch_size=1000):
+    """Delete one batch of lapsed holds; returns how many were removed."""
+    ids = list(StockHold.objects.filter(expires_at__lte=timezone.now())
+               .order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    return StockHold.objects.filter(pk__in=ids).delete()[0]
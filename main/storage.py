@@ -0,0 +1,105 @@
+# main/storage.py
+"""
+Content-addressed storage for private uploads.
+
+Files are written as ``<upload_to>/<aa>/<sha256><ext>``: the digest is
+computed while the upload is streamed to disk, so identical prescriptions
+or reports are stored once and shared between rows. Every saved reference
+is counted in MediaBlob; ``delete()`` only removes the file when the last
+reference goes away. Names never change content, so they are safe to cache
+forever.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CAS_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.[\w]+)?$')
+
+
+def content_digest(name):
+    """The sha256 of a content-addressed file name, or None for legacy names."""
+    match = CAS_NAME_RE.search(name or '')
+    return match.group('digest') if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save()
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory or '.'), exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path(directory or '.'), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            hexdigest = digest.hexdigest()
+            final_name = '/'.join(filter(None, [directory, hexdigest[:2], hexdigest + ext]))
+            final_path = self.path(final_name)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self._add_reference(final_name, size)
+        return final_name
+
+    def delete(self, name):
+        """Drop one reference; remove the file once nothing points at it."""
+        if not name:
+            return
+        MediaBlob = apps.get_model('main', 'MediaBlob')
+        with transaction.atomic():
+            MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            orphaned = MediaBlob.objects.filter(name=name, ref_count__lte=0)
+            if not orphaned.exists() and MediaBlob.objects.filter(name=name).exists():
+                return
+            orphaned.delete()
+        super().delete(name)
+
+    def discard_unreferenced(self, names):
+        """
+        Remove the files among ``names`` that no MediaBlob row points at:
+        files saved in a transaction that then rolled back.
+        """
+        MediaBlob = apps.get_model('main', 'MediaBlob')
+        referenced = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        for name in set(names) - referenced:
+            super().delete(name)
+
+    def _add_reference(self, name, size):
+        MediaBlob = apps.get_model('main', 'MediaBlob')
+        updated = MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+        if not updated:
+            MediaBlob.objects.get_or_create(name=name, defaults={'size': size, 'ref_count': 1})
+
+
+upload_storage = ContentAddressedStorage()
@@ -0,0 +1,195 @@
+# main/suggest.py
+"""
+In-process prefix index behind the search box's type-ahead.
+
+Every product, pet product, doctor and specialty name is stored under its
+whole lower-cased name and under each word of it. The keys sit in one
+sorted list, so a lookup is a bisect to the first key starting with the
+query plus a short scan, with no database query.
+
+The index is built on the first lookup. Saves and deletes in this process
+patch it once their transaction commits (see signals.py). Other workers
+notice through the model version counters the same signals bump on commit
+(main/cache.py) and rebuild on their next lookup. The counters live in the
+default cache, so with several workers it must be a shared one
+(MEDIMART_CACHE_DIR).
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+
+from .cache import model_version, versions_after_own_bump
+from .models import Doctor, PetProduct, Product
+
+SOURCES = ('product', 'petproduct', 'doctor')
+DEFAULT_LIMIT = 8
+MIN_QUERY = 1
+
+_words = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(_words.findall((text or '').casefold()))
+
+
+def _keys(label):
+    name = normalize(label)
+    return {name, *name.split()} - {''}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []       # sorted (key, kind, ident)
+        self._entries = {}    # (kind, ident) -> (label, extra, keys)
+        self._specialties = Counter()
+        self._doctors = {}    # doctor pk -> specialty
+        self._versions = None
+
+    # ---- building ----
+
+    def rebuild(self):
+        # Loaded into a fresh index and swapped in, so lookups keep being
+        # served meanwhile and a failed load leaves the old index in place
+        versions = self._current_versions()
+        fresh = PrefixIndex()
+        for pk, name in Product.objects.values_list('pk', 'name'):
+            fresh._put('product', pk, name, sort=False)
+        for pk, name, category_id in PetProduct.objects.values_list('pk', 'name', 'category_id'):
+            fresh._put('petproduct', pk, name, category_id, sort=False)
+        for pk, name, specialty in Doctor.objects.values_list('pk', 'name', 'specialty'):
+            fresh._put_doctor(pk, name, specialty, sort=False)
+        fresh._keys.sort()
+        with self._lock:
+            self._keys, self._entries = fresh._keys, fresh._entries
+            self._specialties, self._doctors = fresh._specialties, fresh._doctors
+            self._versions = versions
+
+    def _current_versions(self):
+        return tuple(model_version(name) for name in SOURCES)
+
+    def _absorb_own_change(self, source):
+        # Our change bumped its counter too; don't rebuild for it, but do if
+        # any other worker changed something meanwhile
+        self._versions = versions_after_own_bump(self._versions, SOURCES, source)
+
+    def _url(self, kind, ident, label, extra):
+        if kind == 'product':
+            return f"{reverse('search')}?{urlencode({'q': label})}"
+        if kind == 'petproduct':
+            return reverse('pet_category_products', args=[extra])
+        if kind == 'doctor':
+            return reverse('doctor_profile', args=[ident])
+        return f"{reverse('doctors_list')}?{urlencode({'specialty': label})}"
+
+    def _put(self, kind, ident, label, extra=None, sort=True):
+        self._drop(kind, ident)
+        keys = _keys(label)
+        if not keys:
+            return
+        self._entries[(kind, ident)] = (label, extra, keys)
+        for key in keys:
+            if sort:
+                insort(self._keys, (key, kind, ident))
+            else:
+                self._keys.append((key, kind, ident))
+
+    def _drop(self, kind, ident):
+        entry = self._entries.pop((kind, ident), None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            i = bisect_left(self._keys, (key, kind, ident))
+            if i < len(self._keys) and self._keys[i] == (key, kind, ident):
+                del self._keys[i]
+
+    def _put_doctor(self, pk, name, specialty, sort=True):
+        self._drop_doctor(pk)
+        self._put('doctor', pk, name, sort=sort)
+        specialty = (specialty or '').strip()
+        self._doctors[pk] = specialty
+        if specialty:
+            self._specialties[specialty] += 1
+            if self._specialties[specialty] == 1:
+                self._put('specialty', specialty, specialty, sort=sort)
+
+    def _drop_doctor(self, pk):
+        self._drop('doctor', pk)
+        specialty = self._doctors.pop(pk, '')
+        if specialty:
+            self._specialties[specialty] -= 1
+            if self._specialties[specialty] <= 0:
+                del self._specialties[specialty]
+                self._drop('specialty', specialty)
+
+    # ---- incremental updates (called on commit) ----
+
+    def saved(self, instance):
+        with self._lock:
+            if self._versions is None:
+                return  # not built yet, or stale; the next lookup loads everything
+            if isinstance(instance, Product):
+                self._put('product', instance.pk, instance.name)
+                self._absorb_own_change('product')
+            elif isinstance(instance, PetProduct):
+                self._put('petproduct', instance.pk, instance.name, instance.category_id)
+                self._absorb_own_change('petproduct')
+            elif isinstance(instance, Doctor):
+                self._put_doctor(instance.pk, instance.name, instance.specialty)
+                self._absorb_own_change('doctor')
+
+    def deleted(self, instance):
+        with self._lock:
+            if self._versions is None:
+                return
+            if isinstance(instance, Doctor):
+                self._drop_doctor(instance.pk)
+                self._absorb_own_change('doctor')
+            else:
+                kind = 'product' if isinstance(instance, Product) else 'petproduct'
+                self._drop(kind, instance.pk)
+                self._absorb_own_change(kind)
+
+    # ---- lookups ----
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Up to ``limit`` {kind, label, url} dicts whose name or a word of it starts with ``query``."""
+        prefix = normalize(query)
+        if len(prefix) < MIN_QUERY:
+            return []
+        if self._versions != self._current_versions():
+            self.rebuild()
+        return self._lookup(prefix, limit)
+
+    async def asuggest(self, query, limit=DEFAULT_LIMIT):
+        """suggest() for async views; only a rebuild runs in a worker thread."""
+        prefix = normalize(query)
+        if len(prefix) < MIN_QUERY:
+            return []
+        if self._versions != self._current_versions():
+            await sync_to_async(self.rebuild)()
+        return self._lookup(prefix, limit)
+
+    def _lookup(self, prefix, limit):
+        results, seen = [], set()
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(results) < limit:
+                key, kind, ident = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                if (kind, ident) not in seen:
+                    seen.add((kind, ident))
+                    label, extra, _ = self._entries[(kind, ident)]
+                    results.append({'kind': kind, 'label': label, 'url': self._url(kind, ident, label, extra)})
+                i += 1
+        return results
+
+
+index = PrefixIndex()
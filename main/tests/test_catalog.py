@@ -0,0 +1,45 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from main.fuzzy import index as fuzzy_index
+from main.models import Category, Doctor, PetCategory, Product
+from main.suggest import index as suggest_index
+
+
+class AsyncCatalogViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Analgesics")
+        Product.objects.create(category=cls.category, name="Paracetamol", price=3)
+        Doctor.objects.create(name="Dr. Rahman", specialty="Cardiology", languages="en", location="Dhaka")
+        PetCategory.objects.create(name="Dogs")
+
+    def setUp(self):
+        # The in-process indexes may hold rows from other tests; on_commit
+        # never runs here, so force a rebuild
+        suggest_index._versions = fuzzy_index._versions = None
+
+    async def test_pages_render(self):
+        pages = [
+            (reverse('index'), "Analgesics"),
+            (reverse('product_list', args=[self.category.pk]), "Paracetamol"),
+            (reverse('doctors_list') + "?specialty=cardiology", "Dr. Rahman"),
+            (reverse('pet_care'), "Dogs"),
+        ]
+        for url, text in pages:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertContains(response, text)
+
+    async def test_missing_category_is_404(self):
+        response = await self.async_client.get(reverse('product_list', args=[self.category.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_search_falls_back_to_the_typo_tolerant_index(self):
+        response = await self.async_client.get(reverse('search'), {'q': "paracitamol"})
+        self.assertContains(response, "Paracetamol")
+        self.assertEqual(response.context['did_you_mean'], "paracetamol")
+
+    async def test_suggest_returns_json(self):
+        response = await self.async_client.get(reverse('search_suggest'), {'q': "card"})
+        self.assertEqual([r['label'] for r in response.json()['results']], ["Cardiology"])
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+
+from main.media import _parse_range
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_satisfiable_ranges(self):
+        cases = [
+            ('bytes=0-9', 100, (0, 9)),
+            ('bytes=90-', 100, (90, 99)),
+            ('bytes=90-500', 100, (90, 99)),
+            ('bytes=-10', 100, (90, 99)),
+            ('bytes=-500', 100, (0, 99)),
+        ]
+        for header, size, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(_parse_range(header, size), expected)
+
+    def test_unsatisfiable_ranges(self):
+        cases = [
+            ('bytes=-0', 100),
+            ('bytes=-10', 0),
+            ('bytes=0-', 0),
+            ('bytes=100-', 100),
+            ('bytes=-', 100),
+            ('lines=0-9', 100),
+        ]
+        for header, size in cases:
+            with self.subTest(header=header, size=size):
+                self.assertIsNone(_parse_range(header, size))
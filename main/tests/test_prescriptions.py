@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from main.models import Cart, CartItem, Category, Doctor, Prescription, Product
+
+
+class ModerateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(name="Dr. Rahman", specialty="GP", languages="en", location="Dhaka")
+        category = Category.objects.create(name="Antibiotics")
+        cls.product = Product.objects.create(category=category, name="Amoxicillin", requires_prescription=True)
+        cls.otc = Product.objects.create(category=category, name="Saline", requires_prescription=False)
+
+    def make_prescriptions(self, count, prefix='patient'):
+        """``count`` pending prescriptions, each with a cart holding the product."""
+        patients = User.objects.bulk_create(User(username=f"{prefix}{i}") for i in range(count))
+        prescriptions = Prescription.objects.bulk_create(
+            Prescription(patient=patient, image=f'prescriptions/{i}.jpg') for i, patient in enumerate(patients))
+        Prescription.products.through.objects.bulk_create(
+            Prescription.products.through(prescription=rx, product=self.product) for rx in prescriptions)
+        carts = Cart.objects.bulk_create(Cart(user=patient) for patient in patients)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, sku=product.sku)
+            for cart in carts for product in (self.product, self.otc))
+        return [rx.pk for rx in prescriptions]
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        for count in (3, 300):
+            with self.subTest(count=count):
+                ids = self.make_prescriptions(count, prefix=f'batch{count}-')
+                # savepoint, eligible ids, UPDATE, cart DELETE, release
+                with self.assertNumQueries(5):
+                    self.assertEqual(len(Prescription.moderate(ids, self.doctor, 'rejected')), count)
+                self.assertFalse(CartItem.objects.filter(cart__user__username__startswith=f'batch{count}-',
+                                                         product=self.product).exists())
+
+    def test_rejection_removes_only_prescribed_cart_items(self):
+        ids = self.make_prescriptions(2)
+        moderated = Prescription.moderate(ids[:1], self.doctor, 'rejected')
+        self.assertEqual(moderated, ids[:1])
+        rejected = Prescription.objects.get(pk=ids[0])
+        self.assertEqual(rejected.status, 'rejected')
+        self.assertEqual(list(CartItem.objects.filter(cart__user=rejected.patient)
+                              .values_list('product', flat=True)), [self.otc.pk])
+        self.assertEqual(CartItem.objects.exclude(cart__user=rejected.patient).count(), 2)
+
+    def test_leased_prescriptions_are_skipped(self):
+        other = Doctor.objects.create(name="Dr. Akter", specialty="GP", languages="en", location="Dhaka")
+        ids = self.make_prescriptions(2)
+        Prescription.claim_batch(other, size=1)
+        self.assertEqual(len(Prescription.moderate(ids, self.doctor, 'approved')), 1)
+
+
+class LeaseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(name="Dr. Rahman", specialty="GP", languages="en", location="Dhaka")
+        cls.other = Doctor.objects.create(name="Dr. Akter", specialty="GP", languages="en", location="Dhaka")
+        patients = User.objects.bulk_create(User(username=f"patient{i}") for i in range(3))
+        cls.ids = [rx.pk for rx in Prescription.objects.bulk_create(
+            Prescription(patient=patient, image=f'prescriptions/{i}.jpg') for i, patient in enumerate(patients))]
+
+    def test_claims_do_not_overlap(self):
+        mine = Prescription.claim_batch(self.doctor, size=2)
+        theirs = Prescription.claim_batch(self.other, size=2)
+        self.assertEqual(len(mine), 2)
+        self.assertEqual(len(theirs), 1)
+        self.assertFalse({rx.pk for rx in mine} & {rx.pk for rx in theirs})
+        self.assertFalse(Prescription.claimable().exists())
+
+    def test_claiming_again_renews_instead_of_adding(self):
+        first = {rx.pk for rx in Prescription.claim_batch(self.doctor, size=2)}
+        again = {rx.pk for rx in Prescription.claim_batch(self.doctor, size=2)}
+        self.assertEqual(first, again)
+
+    def test_expired_lease_returns_to_the_queue(self):
+        claimed = [rx.pk for rx in Prescription.claim_batch(self.doctor, size=1)]
+        Prescription.objects.filter(pk__in=claimed).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(Prescription.leased_to(self.doctor).exists())
+        self.assertIn(claimed[0], Prescription.claimable().values_list('pk', flat=True))
+        taken = [rx.pk for rx in Prescription.claim_batch(self.other, size=3)]
+        self.assertIn(claimed[0], taken)
+        self.assertEqual(Prescription.objects.get(pk=claimed[0]).claimed_by, self.other)
+
+    def test_release_claims_hands_leases_back(self):
+        Prescription.claim_batch(self.doctor, size=3)
+        Prescription.release_claims(self.doctor)
+        self.assertEqual(Prescription.claimable().count(), 3)
+
+
+class UpdateStatusViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="dr.rahman")
+        cls.doctor = Doctor.objects.create(user=user, name="Dr. Rahman", specialty="GP", languages="en",
+                                           location="Dhaka")
+        cls.prescription = Prescription.objects.create(patient=User.objects.create(username="patient"),
+                                                       image='prescriptions/1.jpg')
+
+    def post(self, status):
+        self.client.force_login(self.doctor.user)
+        response = self.client.post(reverse('update_prescription_status', args=[self.prescription.pk]),
+                                    {'status': status}, follow=True)
+        return [(m.level_tag, str(m)) for m in response.context['messages']]
+
+    def test_reports_success(self):
+        self.assertEqual(self.post('approved'), [('success', "Prescription Approved successfully.")])
+
+    def test_reports_a_prescription_that_was_already_reviewed(self):
+        Prescription.objects.filter(pk=self.prescription.pk).update(status='rejected')
+        self.assertEqual(self.post('approved'),
+                         [('error', "This prescription was already reviewed or reserved by another doctor.")])
+        self.assertEqual(Prescription.objects.get(pk=self.prescription.pk).status, 'rejected')
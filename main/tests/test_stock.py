@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from main import stock
+from main.models import Cart, CartItem, Category, Order, Product, StockHold, StockMovement
+
+
+class StockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Analgesics")
+        cls.product = Product.objects.create(category=category, name="Paracetamol", stock=5)
+        cls.buyer, cls.rival = User.objects.bulk_create([User(username="buyer"), User(username="rival")])
+
+    def cart_for(self, user, quantity):
+        cart = Cart.objects.create(user=user)
+        item = CartItem.objects.create(cart=cart, product=self.product, sku=self.product.sku, quantity=quantity)
+        return cart, [item]
+
+    def order_for(self, user):
+        return Order.objects.create(user=user, total_price=0, payment_method="Cash on Delivery")
+
+    def level(self):
+        self.product.refresh_from_db()
+        return self.product.stock + sum(stock._pending([self.product.sku.pk]).values())
+
+    def test_reserve_holds_units_from_other_carts(self):
+        cart, items = self.cart_for(self.buyer, 4)
+        self.assertEqual(stock.reserve(cart, items), [])
+        rival_cart, rival_items = self.cart_for(self.rival, 2)
+        self.assertEqual(stock.reserve(rival_cart, rival_items), ["Paracetamol"])
+        self.assertFalse(StockHold.objects.filter(cart=rival_cart).exists())
+        self.assertEqual(stock.available([self.product.sku.pk]), {self.product.sku.pk: 1})
+
+    def test_reserve_replaces_the_carts_holds(self):
+        cart, items = self.cart_for(self.buyer, 4)
+        stock.reserve(cart, items)
+        items[0].quantity = 2
+        stock.reserve(cart, items)
+        self.assertEqual(list(StockHold.objects.filter(cart=cart).values_list('quantity', flat=True)), [2])
+
+    def test_lines_without_a_sku_get_one(self):
+        cart = Cart.objects.create(user=self.buyer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get(reverse('checkout')).status_code, 200)
+        self.assertEqual(list(StockHold.objects.values_list('sku', 'quantity')), [(self.product.sku.pk, 2)])
+        self.assertEqual(CartItem.objects.get(cart=cart).sku, self.product.sku)
+
+        CartItem.objects.filter(cart=cart).update(sku=None)
+        self.client.post(reverse('checkout'), {'payment_method': "Cash on Delivery"})
+        order = Order.objects.get(user=self.buyer)
+        self.assertEqual(list(order.items.values_list('sku', flat=True)), [self.product.sku.pk])
+        self.assertEqual(self.level(), 3)
+
+    def test_consume_decrements_stock_and_drops_holds(self):
+        cart, items = self.cart_for(self.buyer, 3)
+        stock.reserve(cart, items)
+        stock.consume(cart, items, self.order_for(self.buyer))
+        self.assertEqual(self.level(), 2)
+        self.assertFalse(StockHold.objects.filter(cart=cart).exists())
+
+    def test_consume_respects_other_carts_holds(self):
+        rival_cart, rival_items = self.cart_for(self.rival, 4)
+        stock.reserve(rival_cart, rival_items)
+        cart, items = self.cart_for(self.buyer, 2)
+        with self.assertRaises(stock.InsufficientStock) as raised:
+            stock.consume(cart, items, self.order_for(self.buyer))
+        self.assertEqual(raised.exception.names, ["Paracetamol"])
+        self.assertEqual(self.level(), 5)
+
+    def test_consume_rechecks_a_held_order(self):
+        for ledger in (False, True):
+            with self.subTest(ledger=ledger), override_settings(STOCK_LEDGER=ledger):
+                Product.objects.filter(pk=self.product.pk).update(stock=5)
+                cart, items = self.cart_for(User.objects.create(username=f"held-{ledger}"), 4)
+                stock.reserve(cart, items)
+                stock.record_movement(self.product.sku, 'adjustment', -3, note="damaged")
+                with self.assertRaises(stock.InsufficientStock):
+                    stock.consume(cart, items, self.order_for(cart.user))
+                self.assertEqual(self.level(), 2)
+
+    def test_expired_holds_are_ignored_then_released(self):
+        cart, items = self.cart_for(self.buyer, 5)
+        stock.reserve(cart, items)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        rival_cart, rival_items = self.cart_for(self.rival, 5)
+        self.assertEqual(stock.reserve(rival_cart, rival_items), [])
+
+        self.assertEqual(stock.release_expired(), 1)
+        self.assertEqual(list(StockHold.objects.values_list('cart', flat=True)), [rival_cart.pk])
+        self.assertEqual(stock.release_expired(), 0)
+
+    @override_settings(STOCK_LEDGER=True)
+    def test_ledger_sales_are_compacted_into_stock(self):
+        cart, items = self.cart_for(self.buyer, 3)
+        stock.reserve(cart, items)
+        stock.consume(cart, items, self.order_for(self.buyer))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertEqual(self.level(), 2)
+
+        self.assertEqual(stock.compact(), (1, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertFalse(StockMovement.objects.filter(compacted=False).exists())
+
+    @override_settings(STOCK_LEDGER=True)
+    def test_compaction_clamps_a_negative_balance(self):
+        StockMovement.objects.create(sku=self.product.sku, kind='adjustment', quantity=-8)
+        with self.assertLogs('medimart.stock', 'ERROR'), self.assertRaises(CommandError):
+            call_command('compact_stock_ledger', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        oversold = StockMovement.objects.get(note=stock.OVERSOLD_NOTE)
+        self.assertEqual((oversold.kind, oversold.quantity, oversold.compacted), ('adjustment', 3, True))
+        self.assertEqual(stock.compact(), (0, 0))
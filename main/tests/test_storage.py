@@ -0,0 +1,120 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from main import lab_reports
+from main.models import MediaBlob, eLabSchedule
+from main.storage import upload_storage
+
+
+class UploadReferenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="patient")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def booking(self, content=None):
+        booking = eLabSchedule(user=self.user, test_type='Blood', test_name="CBC", preferred_date=date(2024, 1, 1),
+                               preferred_time=time(10), address="Dhaka", phone="01700000000")
+        if content:
+            booking.report_file = ContentFile(content, name='report.pdf')
+        booking.save()
+        return booking
+
+    def refs(self, name):
+        return MediaBlob.objects.filter(name=name).values_list('ref_count', flat=True).first()
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.booking(b'%PDF-same'), self.booking(b'%PDF-same')
+        self.assertEqual(first.report_file.name, second.report_file.name)
+        self.assertEqual(self.refs(first.report_file.name), 2)
+
+    def test_replacing_a_file_releases_the_old_blob(self):
+        booking = self.booking(b'%PDF-old')
+        old = booking.report_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.report_file = ContentFile(b'%PDF-new', name='report.pdf')
+            booking.save()
+        self.assertIsNone(self.refs(old))
+        self.assertFalse(upload_storage.exists(old))
+        self.assertEqual(self.refs(booking.report_file.name), 1)
+
+    def test_saving_without_a_new_file_keeps_the_reference(self):
+        booking = self.booking(b'%PDF-kept')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.report_verified = True
+            booking.save()
+        self.assertEqual(self.refs(booking.report_file.name), 1)
+
+    def test_deleting_a_row_releases_one_reference(self):
+        first, second = self.booking(b'%PDF-shared'), self.booking(b'%PDF-shared')
+        name = first.report_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(upload_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertIsNone(self.refs(name))
+        self.assertFalse(upload_storage.exists(name))
+
+    def test_bulk_delete_releases_every_reference(self):
+        name = self.booking(b'%PDF-bulk').report_file.name
+        self.booking(b'%PDF-bulk')
+        with self.captureOnCommitCallbacks(execute=True):
+            eLabSchedule.objects.all().delete()
+        self.assertIsNone(self.refs(name))
+        self.assertFalse(upload_storage.exists(name))
+
+
+class ReportImportRollbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="patient")
+        cls.bookings = eLabSchedule.objects.bulk_create(
+            eLabSchedule(user=user, test_type='Blood', test_name="CBC", preferred_date=date(2024, 1, 1),
+                         preferred_time=time(10), address="Dhaka", phone="01700000000")
+            for _ in range(2))
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def archive(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for booking in self.bookings:
+                archive.writestr(f'{booking.pk}.pdf', b'%PDF-' + str(booking.pk).encode())
+        buffer.seek(0)
+        return buffer
+
+    def test_failed_import_leaves_no_files(self):
+        with mock.patch('main.lab_reports.notifications.elab_report_uploaded',
+                        side_effect=[None, RuntimeError("mail queue down")]):
+            with self.assertRaises(RuntimeError):
+                lab_reports.import_reports(self.archive())
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(upload_storage.path('elab_reports')) if files], [])
+
+    def test_successful_import_keeps_its_files(self):
+        updated = lab_reports.import_reports(self.archive())
+        for booking in updated:
+            self.assertTrue(upload_storage.exists(booking.report_file.name))
+        self.assertEqual(MediaBlob.objects.count(), 2)
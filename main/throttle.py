@@ -0,0 +1,118 @@
+# main/throttle.py
+"""
+Token-bucket throttling for the login and signup forms.
+
+Every login or signup POST runs a full PBKDF2 hash, so a burst of bad
+attempts can use up every worker's CPU. check_auth_throttle() runs before
+the form is built. It takes one token from the client IP's bucket and one
+from the bucket for the submitted username from that IP. When either
+bucket is empty, the request is rejected without hashing anything. The
+username bucket is per IP so that failing logins for someone else's
+username cannot lock them out.
+
+Behind a proxy the client IP is read from THROTTLE_CLIENT_IP_HEADER,
+counting THROTTLE_TRUSTED_PROXIES entries in from the right. Entries
+further left come from the client and could be changed on every request.
+
+Buckets live in the default cache. That cache is per-process with LocMem
+and shared between workers with the file cache (MEDIMART_CACHE_DIR).
+Outcomes are counted in the cache too; see ``manage.py throttle_stats``.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+BUCKET_KEY = 'throttle:bucket:{}:{}:{}'
+COUNTER_KEY = 'throttle:count:{}:{}'
+OUTCOMES = ('allowed', 'rejected')
+
+_lock = threading.Lock()
+
+
+def client_ip(request):
+    header = getattr(settings, 'THROTTLE_CLIENT_IP_HEADER', None)
+    entries = [entry.strip() for entry in request.META.get(header, '').split(',') if entry.strip()] if header else []
+    if entries:
+        # X-Forwarded-For: <anything the client sent>, client, proxy1 ...;
+        # each trusted proxy appends the address it was connected from
+        hops = max(getattr(settings, 'THROTTLE_TRUSTED_PROXIES', 1), 1)
+        return entries[-min(hops, len(entries))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _user_bucket_key(request, scope, username):
+    return _bucket_key(scope, 'user', f"{username.strip().lower()}|{client_ip(request)}")
+
+
+def _bucket_key(scope, kind, value):
+    digest = hashlib.sha1(value.encode()).hexdigest()
+    return BUCKET_KEY.format(scope, kind, digest)
+
+
+def _take(buckets):
+    """
+    Take one token from every bucket, or from none of them. ``buckets`` maps
+    cache key -> (capacity, per_seconds). Returns 0 on success, otherwise
+    the seconds until every bucket has a token again.
+    """
+    now = time.time()
+    with _lock:
+        stored = cache.get_many(list(buckets))
+        levels = {}
+        retry_after = 0
+        for key, (capacity, per_seconds) in buckets.items():
+            rate = capacity / per_seconds
+            tokens, updated = stored.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                retry_after = max(retry_after, math.ceil((1 - tokens) / rate))
+            levels[key] = tokens
+
+        if retry_after:
+            return retry_after
+
+        for key, tokens in levels.items():
+            cache.set(key, (tokens - 1, now), timeout=buckets[key][1])
+    return 0
+
+
+def _count(scope, outcome):
+    key = COUNTER_KEY.format(scope, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def check_auth_throttle(request, scope):
+    """
+    Charge a POST to ``scope`` ('login' or 'signup'). Returns 0 if the
+    request may go ahead, else a Retry-After value in seconds.
+    """
+    rates = settings.AUTH_THROTTLE_RATES[scope]
+    buckets = {_bucket_key(scope, 'ip', client_ip(request)): rates['ip']}
+    username = request.POST.get('username', '').strip()
+    if username:
+        buckets[_user_bucket_key(request, scope, username)] = rates['user']
+
+    retry_after = _take(buckets)
+    _count(scope, 'rejected' if retry_after else 'allowed')
+    return retry_after
+
+
+def reset_user_throttle(request, scope):
+    """A successful login refills the bucket of the username it used."""
+    cache.delete(_user_bucket_key(request, scope, request.POST.get('username', '')))
+
+
+def throttle_counters():
+    keys = {COUNTER_KEY.format(scope, outcome): (scope, outcome)
+            for scope in settings.AUTH_THROTTLE_RATES for outcome in OUTCOMES}
+    values = cache.get_many(keys)
+    return {pair: values.get(key, 0) for key, pair in keys.items()}
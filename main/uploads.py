@@ -0,0 +1,160 @@
+# main/uploads.py
+"""
+Upload hardening for prescriptions and lab reports.
+
+LimitedUploadHandler runs first in FILE_UPLOAD_HANDLERS and counts each
+file's bytes as they stream in. Past UPLOAD_MAX_BYTES (or the field's
+entry in UPLOAD_FIELD_MAX_BYTES) it stops passing chunks on, so the rest
+of the file is neither buffered nor written to disk. The form then
+receives a RejectedUpload that the fields below turn into a form error.
+
+SafeImageField and SafeFileField check an image's dimensions from its
+header before any pixel is decoded, rejecting decompression bombs. They
+then re-encode the image as a JPEG no larger than
+UPLOAD_IMAGE_MAX_DIMENSION on a side. EXIF (location, device), ICC and
+other metadata are dropped, after the EXIF orientation has been applied.
+Re-encoding runs on a small shared thread pool (Pillow releases the GIL
+while decoding and encoding). At most UPLOAD_WORKERS images are held
+decoded at once, however many uploads arrive together. Non-image files
+(PDF reports) are only size-checked.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix='upload')
+    return _pool
+
+
+class RejectedUpload(UploadedFile):
+    """Empty stand-in for a file the upload handler refused; ``error`` says why."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(io.BytesIO(), name=name, content_type=content_type, size=0)
+        self.error = error
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.limit = settings.UPLOAD_FIELD_MAX_BYTES.get(field_name, settings.UPLOAD_MAX_BYTES)
+        self.received = 0
+        self.error = None
+        if self.content_length and self.content_length > self.limit:
+            self.error = self._too_large()
+
+    def _too_large(self):
+        return f"{self.file_name} is larger than {filesizeformat(self.limit)}."
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None  # drop the rest of the file
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self.error = self._too_large()
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.error:
+            return RejectedUpload(self.file_name, self.content_type, self.error)
+        return None  # let the memory/temporary-file handlers build the file
+
+
+def _check_dimensions(image):
+    width, height = image.size
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise forms.ValidationError(
+            f"The image is {width}×{height} pixels; the limit is "
+            f"{settings.UPLOAD_MAX_PIXELS // 1_000_000} megapixels.")
+
+
+def _is_image(upload):
+    """
+    Whether ``upload`` is an image, after checking its dimensions. Only the
+    header is read. The image is not closed, because that would close the
+    upload too.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except UnidentifiedImageError:
+        return False
+    except Image.DecompressionBombError:
+        raise forms.ValidationError("The image has too many pixels.")
+    finally:
+        upload.seek(0)
+    _check_dimensions(image)
+    return True
+
+
+def _reencode(upload):
+    limit = settings.UPLOAD_IMAGE_MAX_DIMENSION
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # JPEGs can decode straight to a smaller scale, skipping full-size pixels
+        image.draft('RGB', (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((limit, limit))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flat = Image.new('RGB', image.size, 'white')
+            flat.paste(image, mask=image.getchannel('A'))
+            image = flat
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        out = io.BytesIO()
+        # No exif/icc_profile arguments: the metadata is not carried over
+        image.save(out, 'JPEG', quality=settings.UPLOAD_IMAGE_QUALITY, optimize=True, progressive=True)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + '.jpg'
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+def normalize_image(upload):
+    """Re-encoded copy of the image ``upload``, made on the upload pool."""
+    try:
+        return _executor().submit(_reencode, upload).result()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise forms.ValidationError("The image could not be processed.")
+
+
+def _rejected(data):
+    if isinstance(data, RejectedUpload):
+        raise forms.ValidationError(data.error)
+
+
+class SafeImageField(forms.ImageField):
+    def to_python(self, data):
+        _rejected(data)
+        if data and hasattr(data, 'name'):
+            _is_image(data)  # dimensions first; super() reports non-images
+        upload = super().to_python(data)  # Pillow verify(); still no pixel decode
+        return normalize_image(upload) if upload is not None else None
+
+
+class SafeFileField(forms.FileField):
+    def to_python(self, data):
+        _rejected(data)
+        upload = super().to_python(data)
+        if upload is None:
+            return None
+        if _is_image(upload):
+            return normalize_image(upload)
+        return upload
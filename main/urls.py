@@ -3,8 +3,9 @@ URL definitions for the main application. These routes map URL
 patterns to corresponding view functions defined in views.py.
 """
 
-from django.urls import path
+from django.urls import path, re_path
 from . import views
+from .media import PROTECTED_MEDIA_DIRS
 from django.conf import settings
 from django.conf.urls.static import static
 from main.views import doctor_elab_list
@@ -15,6 +16,7 @@ urlpatterns = [
     path('categories/', views.category_list, name='category_list'),
     path('category/<int:category_id>/', views.product_list, name='product_list'),
     path('search/', views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
 
     # ---------------- Authentication ----------------
     path('signup/', views.signup_view, name='signup'),
@@ -23,9 +25,11 @@ urlpatterns = [
 
     # ---------------- Cart & Checkout ----------------
     path('cart/', views.cart_view, name='cart'),
-    path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
-    path('cart/update/<int:product_id>/', views.update_cart, name='update_cart'),
-    path('cart/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/add/<slug:sku_code>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/update/<slug:sku_code>/', views.update_cart, name='update_cart'),
+    path('cart/remove/<slug:sku_code>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/item/<int:item_id>/update/', views.update_cart_item, name='update_cart_item'),
+    path('cart/item/<int:item_id>/remove/', views.remove_cart_item, name='remove_cart_item'),
     path('checkout/', views.checkout, name='checkout'),
 
     # ---------------- Doctors & Appointments ----------------
@@ -41,6 +45,7 @@ urlpatterns = [
     path('my-prescriptions/', views.my_prescriptions, name='my_prescriptions'),
     path('review-prescriptions/', views.review_prescriptions, name='review_prescriptions'),
     path('update-prescription/<int:prescription_id>/', views.update_prescription_status, name='update_prescription_status'),
+    path('update-prescriptions/bulk/', views.bulk_update_prescriptions, name='bulk_update_prescriptions'),
     path('requested-prescriptions/', views.requested_prescriptions, name='requested_prescriptions'),
 
     # ---------------- Patient ----------------
@@ -50,6 +55,8 @@ urlpatterns = [
 
     # ---------------- Admin / Staff ----------------
     path('manage-users/', views.manage_users, name='manage_users'),
+    path('staff/sales/', views.sales_dashboard, name='sales_dashboard'),
+    path('staff/occupancy/', views.occupancy_dashboard, name='occupancy_dashboard'),
 
     # ---------------- Pet Care ----------------
     path('pet-care/', views.pet_care, name='pet_care'),
@@ -71,6 +78,16 @@ urlpatterns = [
     path('doctor/elab/', doctor_elab_list, name='doctor_elab_list'),
     path("elab/pay/<int:test_id>/", views.pay_elab, name="pay_elab"),
 
+    # ---------------- Calendar feeds ----------------
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/regenerate/', views.regenerate_calendar_feed, name='regenerate_calendar_feed'),
+
+    # ---------------- Private uploads (permission-checked) ----------------
+    re_path(
+        r'^%s(?P<path>(?:%s)/.+)$' % (settings.MEDIA_URL.lstrip('/'), '|'.join(PROTECTED_MEDIA_DIRS)),
+        views.protected_media,
+        name='protected_media',
+    ),
 ]
 
 # Serve media files in development
@@ -1,50 +1,124 @@
 # main/views.py
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.utils import timezone
 
 from django.views.decorators.csrf import csrf_protect
 from django.db import transaction
-from django.db.models import F, Sum
+from django.db.models import F, Q, Sum
+from django.utils.dateparse import parse_date
 
 from .models import (
-    Category, Product, Order, OrderItem,
-    Prescription, Cart, Doctor, Schedule, Appointment, CartItem, PetProduct, eLabSchedule
+    Category, Product, Order, OrderItem, ArchivedOrder,
+    Prescription, Cart, Doctor, Schedule, Appointment, CartItem, PetProduct, eLabSchedule,
+    DoctorOccupancy, DAYS_OF_WEEK,
 )
 from .forms import SignupForm, PrescriptionForm, AppointmentPrescriptionForm, eLabReportUploadForm
+from .db import read_replica
+from .throttle import check_auth_throttle, reset_user_throttle
+from . import lab_reports, notifications, stock
+from .recommendations import arecommend, recommend
+from .analytics import RANGES, sales_summary
+from . import queries
+from .suggest import index as suggest_index
+from .fuzzy import index as fuzzy_index
+
+ORDER_HISTORY_PAGE_SIZE = 10
+MANAGE_USERS_PAGE_SIZE = 50
+ELAB_CONSOLE_PAGE_SIZE = 50
+
+
+# The read-only catalog pages are async, so under ASGI a slow client holds
+# a coroutine rather than a worker. Their querysets are evaluated with the
+# async ORM before rendering.
+async def arender(request, template_name, context=None):
+    """
+    render() for async views. The context processors (cart count, role
+    flags) still use the sync ORM, so rendering runs in a worker thread.
+    """
+    return await sync_to_async(render)(request, template_name, context)
 
 
 # -------------------- HOME & CATEGORIES --------------------
 
-def index(request):
-    categories = Category.objects.all()
-    return render(request, 'main/index.html', {'categories': categories})
+@read_replica
+async def index(request):
+    categories = [c async for c in Category.objects.all()]
+    return await arender(request, 'main/index.html', {'categories': categories})
 
 
+@read_replica
 def category_list(request):
     categories = Category.objects.all()
     return render(request, 'main/category.html', {'categories': categories})
 
 
-def product_list(request, category_id: int):
-    category = get_object_or_404(Category, id=category_id)
-    products = Product.objects.filter(category=category)
-    return render(request, 'main/product_list.html', {'category': category, 'products': products})
+@read_replica
+async def product_list(request, category_id: int):
+    category = await aget_object_or_404(Category, id=category_id)
+    products = [p async for p in Product.objects.filter(category=category)]
+    return await arender(request, 'main/product_list.html', {
+        'category': category,
+        'products': products,
+        'recommended': await arecommend(product_ids=[p.id for p in products]),
+    })
 
 
-def search(request):
+@read_replica
+async def search(request):
     query = request.GET.get('q', '').strip()
-    products = Product.objects.filter(name__icontains=query) if query else []
-    return render(request, 'main/search.html', {'query': query, 'products': products})
+    products, did_you_mean = [], None
+    if query:
+        medicines, pet_products = queries.catalog_search(query)
+        products = [p async for p in medicines]
+        products += [p async for p in pet_products]
+        if not products:
+            # Nothing contains the text as typed; try the typo-tolerant index
+            did_you_mean, matches = await fuzzy_index.asearch(query)
+            products = await _fuzzy_products(matches)
+    return await arender(request, 'main/search.html', {
+        'query': query,
+        'products': products,
+        'did_you_mean': did_you_mean,
+    })
+
+
+async def _fuzzy_products(matches):
+    """Product/PetProduct rows for fuzzy ``matches``, best match first."""
+    ids = {'product': [], 'petproduct': []}
+    for kind, pk, _ in matches:
+        ids[kind].append(pk)
+    rows = {('product', p.pk): p async for p in Product.objects.filter(pk__in=ids['product'])}
+    rows.update({('petproduct', p.pk): p async for p in PetProduct.objects.filter(pk__in=ids['petproduct'])})
+    return [rows[kind, pk] for kind, pk, _ in matches if (kind, pk) in rows]
+
+
+async def search_suggest(request):
+    # Served from the in-process prefix index; no database query
+    results = await suggest_index.asuggest(request.GET.get('q', '')[:100])
+    return JsonResponse({'results': results})
 
 
 # -------------------- AUTHENTICATION --------------------
 
+def throttled_response(request, template_name, form, retry_after):
+    messages.error(request, f'Too many attempts. Please try again in {retry_after} seconds.')
+    response = render(request, template_name, {'form': form}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
 @csrf_protect
 def signup_view(request):
     if request.user.is_authenticated:
@@ -52,6 +126,11 @@ def signup_view(request):
         return redirect('index')
 
     if request.method == 'POST':
+        # Checked before the form so rejected requests never hash a password
+        retry_after = check_auth_throttle(request, 'signup')
+        if retry_after:
+            return throttled_response(request, 'main/signup.html', SignupForm(), retry_after)
+
         form = SignupForm(request.POST)
         role = request.POST.get('role')  # 'patient' or 'doctor'
 
@@ -84,9 +163,14 @@ def login_view(request):
         return redirect('index')
 
     if request.method == "POST":
+        retry_after = check_auth_throttle(request, 'login')
+        if retry_after:
+            return throttled_response(request, 'main/login.html', AuthenticationForm(request), retry_after)
+
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
             user = form.get_user()
+            reset_user_throttle(request, 'login')
             login(request, user)
             if hasattr(user, 'doctor_profile'):
                 return redirect('doctor_dashboard')
@@ -113,67 +197,45 @@ from django.db.models import F, Sum
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from .models import Product, PetProduct, Cart, CartItem
+from .models import Product, PetProduct, Cart, CartItem, Sku
 
 @login_required
-def add_to_cart(request, product_id):
+def add_to_cart(request, sku_code):
     cart, _ = Cart.objects.get_or_create(user=request.user)
 
-    # Try normal Product first
-    try:
-        product = Product.objects.get(id=product_id)
-        item, created = CartItem.objects.get_or_create(
-            cart=cart, product=product, pet_product=None, defaults={'quantity': 1}
-        )
-        if not created:
-            item.quantity += 1
-            item.save()
-        messages.success(request, f"{product.name} added to cart.")
-        return redirect('cart')
-
-    except Product.DoesNotExist:
-        pass
-
-    # Try PetProduct
-    try:
-        pet_product = PetProduct.objects.get(id=product_id)
-        item, created = CartItem.objects.get_or_create(
-            cart=cart, product=None, pet_product=pet_product, defaults={'quantity': 1}
-        )
-        if not created:
-            item.quantity += 1
-            item.save()
-        messages.success(request, f"{pet_product.name} added to cart.")
-        return redirect('cart')
-
-    except PetProduct.DoesNotExist:
+    # One keyed lookup resolves both medicines and pet products
+    sku = Sku.resolve(sku_code)
+    if sku is None:
         messages.error(request, "Product not found.")
         return redirect('cart')
 
+    item, created = CartItem.objects.get_or_create(
+        cart=cart, sku=sku,
+        defaults={'product': sku.product, 'pet_product': sku.pet_product, 'quantity': 1}
+    )
+    if not created:
+        CartItem.objects.filter(pk=item.pk).update(quantity=F('quantity') + 1, updated_at=timezone.now())
+    messages.success(request, f"{sku.name} added to cart.")
+    return redirect('cart')
+
 
-@login_required
-def update_cart(request, product_id: int):
+def _update_cart_line(request, lines):
     if request.method == 'POST':
         try:
             quantity = int(request.POST.get('quantity', '1'))
         except ValueError:
             quantity = 1
 
-        cart = Cart.objects.filter(user=request.user).first()
-        if not cart:
-            return redirect('cart')
-
-        # Support both Product and PetProduct
-        cart_item = CartItem.objects.filter(cart=cart, product_id=product_id).first()
-        if not cart_item:
-            cart_item = CartItem.objects.filter(cart=cart, pet_product_id=product_id).first()
+        cart_item = (lines.filter(cart__user=request.user)
+                     .select_related('product', 'pet_product')
+                     .first())
 
         if cart_item:
             if quantity > 0:
                 cart_item.quantity = quantity
-                cart_item.save()
-                item_name = cart_item.product.name if cart_item.product else cart_item.pet_product.name
-                messages.success(request, f"Updated quantity for {item_name}.")
+                cart_item.save(update_fields=['quantity', 'updated_at'])
+                item = cart_item.product or cart_item.pet_product
+                messages.success(request, f"Updated quantity for {item.name if item else 'item'}.")
             else:
                 cart_item.delete()
                 messages.info(request, "Item removed from cart.")
@@ -182,12 +244,26 @@ def update_cart(request, product_id: int):
 
 
 @login_required
-def remove_from_cart(request, product_id: int):
-    cart = Cart.objects.filter(user=request.user).first()
-    if cart:
-        deleted_count = CartItem.objects.filter(cart=cart, product_id=product_id).delete()[0]
-        if not deleted_count:
-            CartItem.objects.filter(cart=cart, pet_product_id=product_id).delete()
+def update_cart(request, sku_code):
+    return _update_cart_line(request, queries.cart_line(request.user, sku_code))
+
+
+@login_required
+def remove_from_cart(request, sku_code):
+    queries.cart_line(request.user, sku_code).delete()
+    return redirect('cart')
+
+
+# Lines without a SKU (added in the admin, or missed by the backfill) are
+# addressed by their own id instead
+@login_required
+def update_cart_item(request, item_id):
+    return _update_cart_line(request, CartItem.objects.filter(pk=item_id))
+
+
+@login_required
+def remove_cart_item(request, item_id):
+    CartItem.objects.filter(cart__user=request.user, pk=item_id).delete()
     return redirect('cart')
 
 
@@ -204,7 +280,7 @@ from .models import Cart, CartItem, Prescription
 @login_required
 def cart_view(request):
     cart = Cart.objects.filter(user=request.user).first()
-    cart_items = cart.items.select_related('product', 'pet_product') if cart else []
+    cart_items = cart.items.select_related('product', 'pet_product', 'sku') if cart else []
 
     # Check prescription requirement
     presc_ids = {ci.product_id for ci in cart_items if ci.product and ci.product.requires_prescription} | \
@@ -213,11 +289,7 @@ def cart_view(request):
     prescription_required = bool(presc_ids)
 
     if prescription_required:
-        approved_count = (Prescription.objects
-                          .filter(patient=request.user, status='approved', products__in=presc_ids)
-                          .values('products')
-                          .distinct()
-                          .count())
+        approved_count = queries.approved_prescription_products(request.user, presc_ids).count()
         has_approved_prescription = (approved_count == len(presc_ids))
     else:
         has_approved_prescription = True
@@ -230,6 +302,10 @@ def cart_view(request):
         'total': total,
         'prescription_required': prescription_required,
         'has_approved_prescription': has_approved_prescription,
+        'recommended': recommend(
+            product_ids=[ci.product_id for ci in cart_items if ci.product_id],
+            pet_product_ids=[ci.pet_product_id for ci in cart_items if ci.pet_product_id],
+        ),
     }
     return render(request, 'main/cart.html', context)
 
@@ -242,8 +318,9 @@ def checkout(request):
         messages.warning(request, "Your cart is empty.")
         return redirect('cart')
 
-    # Prefetch items
-    cart_items = cart.items.select_related('product', 'pet_product')
+    # Prefetch items. A list, so the SKUs stock.reserve()/consume() fill in
+    # for lines saved without one are the ones copied into the order items.
+    cart_items = list(cart.items.select_related('product', 'pet_product'))
 
     # Compute total using subtotal property
     total = sum(item.subtotal for item in cart_items)
@@ -254,13 +331,7 @@ def checkout(request):
 
     has_approved = True
     if needs_rx:
-        approved_count = (
-            Prescription.objects
-            .filter(patient=request.user, status='approved', products__in=rx_product_ids)
-            .values('products')
-            .distinct()
-            .count()
-        )
+        approved_count = queries.approved_prescription_products(request.user, rx_product_ids).count()
         has_approved = (approved_count == len(rx_product_ids))
 
     if needs_rx and not has_approved:
@@ -276,38 +347,54 @@ def checkout(request):
             messages.error(request, "Please select a payment method.")
             return redirect('checkout')
 
-        with transaction.atomic():
-            order = Order.objects.create(
-                user=request.user,
-                total_price=total,
-                payment_method=method,
-                status="pending",
-                is_paid=(method != "Cash on Delivery"),
-            )
-
-            # Create order items, preserving name & price
-            for it in cart_items:
-                item_name, item_price = (
-                    (it.product.name, it.product.price) if it.product
-                    else (it.pet_product.name, it.pet_product.price) if it.pet_product
-                    else ("Unknown Product", 0)
-                )
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=it.product,
-                    pet_product=it.pet_product,
-                    quantity=it.quantity,
-                    price=item_price,
-                    name=item_name
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(
+                    user=request.user,
+                    total_price=total,
+                    payment_method=method,
+                    status="pending",
+                    is_paid=(method != "Cash on Delivery"),
                 )
 
-            # Clear cart
-            cart.items.all().delete()
+                # Re-checks stock and records the sale; drops the cart's holds
+                stock.consume(cart, cart_items, order)
+
+                # Create order items, preserving name & price
+                for it in cart_items:
+                    item_name, item_price = (
+                        (it.product.name, it.product.price) if it.product
+                        else (it.pet_product.name, it.pet_product.price) if it.pet_product
+                        else ("Unknown Product", 0)
+                    )
+
+                    OrderItem.objects.create(
+                        order=order,
+                        product=it.product,
+                        pet_product=it.pet_product,
+                        sku_id=it.sku_id,
+                        quantity=it.quantity,
+                        price=item_price,
+                        name=item_name
+                    )
+
+                # Clear cart
+                cart.items.all().delete()
+
+                notifications.order_placed(order)
+        except stock.InsufficientStock as exc:
+            messages.error(request, f"Sorry, not enough stock left for: {', '.join(exc.names)}.")
+            return redirect('cart')
 
         messages.success(request, f"Your order #{order.id} has been placed successfully!")
         return redirect('patient_dashboard')
 
+    # Hold the stock while the buyer is on the checkout page
+    short = stock.reserve(cart, cart_items)
+    if short:
+        messages.error(request, f"Sorry, not enough stock left for: {', '.join(short)}.")
+        return redirect('cart')
+
     # Render checkout page
     return render(request, 'main/checkout.html', {
         'cart_items': cart_items,
@@ -315,6 +402,7 @@ def checkout(request):
         'payment_methods': payment_methods,
         'prescription_required': needs_rx,
         'has_approved_prescription': has_approved,
+        'hold_minutes': settings.STOCK_HOLD_MINUTES,
     })
 
 
@@ -322,11 +410,17 @@ def checkout(request):
 
 # -------------------- DOCTORS & APPOINTMENTS --------------------
 
-def doctor_list(request):
+@read_replica
+async def doctor_list(request):
     doctors = Doctor.objects.all()
-    return render(request, "main/doctors_list.html", {"doctors": doctors})
+    specialty = request.GET.get('specialty', '').strip()
+    if specialty:
+        doctors = doctors.filter(specialty__iexact=specialty)
+    doctors = [d async for d in doctors]
+    return await arender(request, "main/doctors_list.html", {"doctors": doctors, "specialty": specialty})
 
 
+@read_replica
 def doctor_profile(request, doctor_id):
     doctor = get_object_or_404(Doctor, id=doctor_id)
     schedules = Schedule.objects.filter(doctor=doctor).order_by('day', 'start_time')
@@ -351,19 +445,21 @@ def book_appointment(request, doctor_id):
         time = request.POST.get("time")
         notes = request.POST.get("notes", "")
 
-        exists = Appointment.objects.filter(doctor=doctor, date=date, time=time).exists()
+        exists = queries.slot_taken(doctor, date, time).exists()
         if exists:
             messages.error(request, "This time slot is already booked. Please choose another.")
             return redirect("doctor_profile", doctor_id=doctor.id)
 
-        Appointment.objects.create(
-            doctor=doctor,
-            patient=request.user,
-            visit_type=visit_type,
-            date=date,
-            time=time,
-            notes=notes,
-        )
+        with transaction.atomic():
+            appointment = Appointment.objects.create(
+                doctor=doctor,
+                patient=request.user,
+                visit_type=visit_type,
+                date=date,
+                time=time,
+                notes=notes,
+            )
+            notifications.appointment_booked(appointment)
         messages.success(request, "Appointment booked successfully.")
 
         if request.user.groups.filter(name='Doctor').exists():
@@ -382,9 +478,12 @@ from django.contrib.auth.decorators import login_required
 @login_required
 def upload_prescription(request):
     cart = Cart.objects.filter(user=request.user).first()
-    cart_items = cart.items.select_related('product') if cart else []
+    cart_items = cart.items.select_related('product', 'pet_product') if cart else []
+    rx_products = [ci.product for ci in cart_items if ci.product and ci.product.requires_prescription]
+    rx_pet_products = [ci.pet_product for ci in cart_items
+                       if ci.pet_product and ci.pet_product.prescription_required]
     # Compute RX need from flags
-    prescription_required = any(ci.product.requires_prescription for ci in cart_items) if cart_items else False  # [web:221]
+    prescription_required = bool(rx_products or rx_pet_products)  # [web:221]
 
     # If no RX needed, go back to cart (do not jump to checkout here)
     if not prescription_required:
@@ -398,9 +497,8 @@ def upload_prescription(request):
                 patient=request.user, image=form.cleaned_data['image'], status='pending'
             )  # [web:221]
             # Link only RX items currently in cart
-            for it in cart_items:
-                if it.product.requires_prescription:
-                    p.products.add(it.product)  # [web:221]
+            p.products.add(*rx_products)  # [web:221]
+            p.pet_products.add(*rx_pet_products)
             messages.success(request, "Prescription uploaded successfully. Wait for approval.")
             return redirect('cart')  # return to cart; button will remain disabled until approved [web:221]
     else:
@@ -425,7 +523,13 @@ def review_prescriptions(request):
         messages.error(request, "You are not authorized to review prescriptions.")
         return redirect('index')
 
-    prescriptions = Prescription.objects.filter(status='pending').order_by('uploaded_at')
+    if hasattr(request.user, 'doctor_profile'):
+        # Doctors only see the batch leased to them
+        prescriptions = Prescription.claim_batch(request.user.doctor_profile)
+    else:
+        prescriptions = (Prescription.objects.filter(status='pending')
+                         .select_related('patient', 'claimed_by')
+                         .order_by('uploaded_at'))
     return render(request, 'main/review_prescriptions.html', {'prescriptions': prescriptions})
 
 
@@ -437,23 +541,48 @@ def update_prescription_status(request, prescription_id):
         return redirect("requested_prescriptions")
 
     if request.method == "POST":
+        doctor = request.user.doctor_profile
+        if not prescription.is_claimable_by(doctor):
+            messages.error(request, "This prescription is being reviewed by another doctor.")
+            return redirect("requested_prescriptions")
+
         status = request.POST.get("status")
-        notes = request.POST.get("doctor_notes", "")
-        prescription.status = status
-        if status in ["approved", "rejected"]:
-            prescription.doctor = request.user.doctor_profile
-            prescription.doctor_notes = notes
-        prescription.save()
-
-        if status == "rejected":
-            cart = Cart.objects.filter(user=prescription.patient).first()
-            if cart:
-                CartItem.objects.filter(
-                    cart=cart,
-                    product__in=prescription.products.all(),
-                    product__requires_prescription=True
-                ).delete()
-        messages.success(request, f"Prescription {status.capitalize()} successfully.")
+        if status not in ("approved", "rejected"):
+            messages.error(request, "Invalid status.")
+            return redirect("requested_prescriptions")
+
+        with transaction.atomic():
+            updated = Prescription.moderate([prescription.id], doctor, status, request.POST.get("doctor_notes", ""))
+            notifications.prescriptions_reviewed(updated, status)
+        if updated:
+            messages.success(request, f"Prescription {status.capitalize()} successfully.")
+        else:
+            messages.error(request, "This prescription was already reviewed or reserved by another doctor.")
+    return redirect("requested_prescriptions")
+
+
+@login_required
+def bulk_update_prescriptions(request):
+    if not hasattr(request.user, "doctor_profile"):
+        messages.error(request, "You are not authorized to update prescriptions.")
+        return redirect("index")
+
+    if request.method == "POST":
+        status = request.POST.get("status")
+        ids = [pk for pk in request.POST.getlist("prescription_ids") if pk.isdigit()]
+        if status not in ("approved", "rejected") or not ids:
+            messages.error(request, "Select at least one prescription and a status.")
+            return redirect("requested_prescriptions")
+
+        with transaction.atomic():
+            updated = Prescription.moderate(
+                ids, request.user.doctor_profile, status, request.POST.get("doctor_notes", "")
+            )
+            notifications.prescriptions_reviewed(updated, status)
+        skipped = len(ids) - len(updated)
+        messages.success(request, f"{len(updated)} prescription(s) {status}.")
+        if skipped:
+            messages.warning(request, f"{skipped} prescription(s) were already reviewed or reserved by another doctor.")
     return redirect("requested_prescriptions")
 
 
@@ -466,7 +595,7 @@ def doctor_dashboard(request):
         return redirect('index')
 
     doctor = request.user.doctor_profile
-    appointments = Appointment.objects.filter(doctor=doctor).order_by('date', 'time')
+    appointments = queries.doctor_appointments(doctor)
 
     paid_appointments_count = appointments.filter(is_paid=True).count()
     total_earnings = sum(app.doctor.fee for app in appointments if app.is_paid)
@@ -485,9 +614,17 @@ def requested_prescriptions(request):
         messages.error(request, "You are not a doctor.")
         return redirect('index')
 
-    prescriptions = Prescription.objects.filter(status='pending').order_by('-uploaded_at')
+    doctor = request.user.doctor_profile
+    if request.method == 'POST' and request.POST.get('action') == 'release':
+        released = Prescription.release_claims(doctor)
+        messages.info(request, f"{released} prescription(s) returned to the queue.")
+        return redirect('requested_prescriptions')
+
+    # Lease the next batch of unclaimed prescriptions to this doctor
+    prescriptions = Prescription.claim_batch(doctor)
     context = {
         'prescriptions': prescriptions,
+        'waiting_count': Prescription.claimable().count(),
         'is_doctor': True,
     }
     return render(request, 'main/requested_prescriptions.html', context)
@@ -497,10 +634,12 @@ def requested_prescriptions(request):
 def patient_dashboard(request):
     user = request.user  # <-- Add this line
 
-    prescriptions = Prescription.objects.filter(patient=request.user).order_by('-uploaded_at')
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    appointments = Appointment.objects.filter(patient=request.user).order_by('date', 'time')
-    elab_schedules = eLabSchedule.objects.filter(user=user)  # Add this line
+    history = queries.patient_history(user)
+    prescriptions = history['prescriptions']
+    # Latest orders only; the full history lives on the paginated order_status page
+    orders = history['orders'].prefetch_related('items')[:ORDER_HISTORY_PAGE_SIZE]
+    appointments = history['appointments']
+    elab_schedules = history['elab_schedules']
 
     if not prescriptions.exists() and not appointments.exists() and not orders.exists():
         return redirect('index')
@@ -510,21 +649,102 @@ def patient_dashboard(request):
         'orders': orders,
         'appointments': appointments,
         'elab_schedules': elab_schedules,  # Pass to template
-
+        'calendar_feed': CalendarFeed.for_user(request.user),
     }
     return render(request, 'main/patient_dashboard.html', context)
 
 
+def _parse_date(value):
+    try:
+        return parse_date(value)
+    except ValueError:  # well-formed but impossible, e.g. 2024-02-30
+        return None
+
+
 @staff_member_required
 def manage_users(request):
-    users = User.objects.all()
-    return render(request, 'main/manage_users.html', {'users': users})
+    filters = {
+        'q': request.GET.get('q', '').strip(),
+        'role': request.GET.get('role', ''),
+        'active': request.GET.get('active', ''),
+        'joined_from': _parse_date(request.GET.get('joined_from', '')),
+        'joined_to': _parse_date(request.GET.get('joined_to', '')),
+    }
+    users = queries.user_directory(filters).prefetch_related('groups')
+    page = Paginator(users, MANAGE_USERS_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'main/manage_users.html', {
+        'users': page,
+        'page_obj': page,
+        'filters': filters,
+    })
+
+
+@staff_member_required
+def sales_dashboard(request):
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in RANGES:
+        days = 30
+    return render(request, 'main/sales_dashboard.html', {
+        'summary': sales_summary(days),
+        'days': days,
+        'ranges': RANGES,
+    })
+
+
+def _heatmap_rows(occupancy):
+    """(hours, rows): one row per weekday of {capacity, booked, forecast, load} cells."""
+    active = [hour for hour in range(24)
+              if any(occupancy.capacity[day][hour] or occupancy.booked[day][hour] for day in range(7))]
+    hours = range(min(active), max(active) + 1) if active else range(9, 18)
+    rows = []
+    for day, (name, _) in enumerate(DAYS_OF_WEEK):
+        cells = []
+        for hour in hours:
+            capacity, forecast = occupancy.capacity[day][hour], occupancy.forecast[day][hour]
+            cells.append({
+                'capacity': capacity,
+                'booked': occupancy.booked[day][hour],
+                'forecast': forecast,
+                # Heat from 0 (idle) to 1 (fully booked); None for unscheduled hours
+                'load': round(min(forecast / capacity, 1), 2) if capacity else None,
+            })
+        rows.append({'day': name, 'cells': cells})
+    return hours, rows
+
+
+@staff_member_required
+def occupancy_dashboard(request):
+    doctors = DoctorOccupancy.objects.select_related('doctor').order_by('-utilization')
+    selected = None
+    if request.GET.get('doctor', '').isdigit():
+        selected = next((o for o in doctors if o.doctor_id == int(request.GET['doctor'])), None)
+    context = {'doctors': doctors, 'selected': selected}
+    if selected is not None:
+        context['hours'], context['rows'] = _heatmap_rows(selected)
+        context['suggestions'] = [
+            {'kind': kind, 'day': DAYS_OF_WEEK[day][0], 'hour': hour, 'forecast': forecast, 'capacity': capacity}
+            for kind, day, hour, forecast, capacity in selected.suggestions
+        ]
+    return render(request, 'main/occupancy_dashboard.html', context)
 
 
 @login_required
 def order_status(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'main/order_status.html', {'orders': orders})
+    # Archived (old delivered/cancelled) orders are only read on request
+    show_archived = request.GET.get('archived') == '1'
+    model = ArchivedOrder if show_archived else Order
+    orders = (model.objects.filter(user=request.user)
+              .prefetch_related('items')
+              .order_by('-created_at'))
+    page = Paginator(orders, ORDER_HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'main/order_status.html', {
+        'orders': page,
+        'page_obj': page,
+        'show_archived': show_archived,
+    })
 
 
 @login_required
@@ -566,6 +786,7 @@ def doctor_appointments(request):
     return render(request, 'main/doctor_appointments.html', {
         'appointments': appointments,
         'doctor': doctor,
+        'calendar_feed': CalendarFeed.for_user(request.user),
     })
 
 
@@ -598,28 +819,33 @@ from django.contrib import messages
 from django.shortcuts import render
 from .models import PetCategory
 
-def pet_care(request):
+@read_replica
+async def pet_care(request):
     # fetch all pet categories
-    categories = PetCategory.objects.all()
-    return render(request, 'main/pet_care.html', {'categories': categories})
+    categories = [c async for c in PetCategory.objects.all()]
+    return await arender(request, 'main/pet_care.html', {'categories': categories})
 
 
 # --- Products for a Pet Category (Add to cart form will post to existing add_to_cart view) ---
+@read_replica
 def pet_category_products(request, category_id: int):
     category = get_object_or_404(PetCategory, id=category_id)  # ✅ Use PetCategory
     products = PetProduct.objects.filter(category=category)     # ✅ Use PetProduct
     return render(request, 'main/pet_category_products.html', {
         'category': category,
-        'products': products
+        'products': products,
+        'recommended': recommend(pet_product_ids=products.values_list('id', flat=True)),
     })
 
 
 
 # --- List only veterinarians ---
+@read_replica
 def pet_doctors(request):
     vets = Doctor.objects.filter(doctor_type='vet')
     return render(request, 'main/pet_doctors.html', {'vets': vets})
 
+@read_replica
 def pet_category_detail(request, category_id: int):
     category = get_object_or_404(PetCategory, id=category_id)
     products = PetProduct.objects.filter(category=category)
@@ -642,7 +868,7 @@ def book_pet_appointment(request, doctor_id):
         notes = request.POST.get('notes', '').strip()
 
         # Validate slot availability (Appointment model already uses unique constraint on doctor+date+time)
-        if Appointment.objects.filter(doctor=doctor, date=date, time=time).exists():
+        if queries.slot_taken(doctor, date, time).exists():
             messages.error(request, "This time slot is already booked. Please choose another.")
             return redirect('book_pet_appointment', doctor_id=doctor.id)
 
@@ -657,13 +883,15 @@ def book_pet_appointment(request, doctor_id):
             except ValueError:
                 pass
 
-        Appointment.objects.create(
-            doctor=doctor,
-            patient=request.user,
-            visit_type='online',
-            date=date, time=time,
-            notes=(f"Pet: {pet_name}\n" + notes) if pet_name or notes else notes
-        )
+        with transaction.atomic():
+            appointment = Appointment.objects.create(
+                doctor=doctor,
+                patient=request.user,
+                visit_type='online',
+                date=date, time=time,
+                notes=(f"Pet: {pet_name}\n" + notes) if pet_name or notes else notes
+            )
+            notifications.appointment_booked(appointment)
 
         messages.success(request, "Appointment booked successfully. The veterinarian will contact you.")
         return redirect('patient_dashboard')
@@ -671,6 +899,7 @@ def book_pet_appointment(request, doctor_id):
     # GET
     return render(request, 'main/book_pet_appointment.html', {'doctor': doctor})
 
+@read_replica
 def pet_doctors(request):
     doctors = Doctor.objects.filter(doctor_type='vet')
     return render(request, 'main/pet_doctors.html', {'doctors': doctors})
@@ -694,16 +923,18 @@ def book_vet_appointment(request, doctor_id):
         time = request.POST.get('time')
         notes = request.POST.get('notes', '')
 
-        Appointment.objects.create(
-            doctor=doctor,
-            patient=request.user if request.user.is_authenticated else None,
-            patient_name=name,
-            patient_phone=phone,
-            visit_type=visit_type,
-            date=date,
-            time=time,
-            notes=notes
-        )
+        with transaction.atomic():
+            appointment = Appointment.objects.create(
+                doctor=doctor,
+                patient=request.user if request.user.is_authenticated else None,
+                patient_name=name,
+                patient_phone=phone,
+                visit_type=visit_type,
+                date=date,
+                time=time,
+                notes=notes
+            )
+            notifications.appointment_booked(appointment)
         messages.success(request, f"Appointment booked with {doctor.name} on {date} at {time}.")
         return redirect('book_vet_appointment', doctor_id=doctor.id)
 
@@ -724,7 +955,7 @@ def add_pet_to_cart(request, petproduct_id):
     cart_item, created = CartItem.objects.get_or_create(
         cart=cart,
         pet_product=pet,
-        defaults={'quantity': 1}
+        defaults={'quantity': 1, 'sku': Sku.for_item(pet)}
     )
     if not created:
         cart_item.quantity += 1
@@ -826,31 +1057,69 @@ def doctor_elab_list(request):
         messages.error(request, "You do not have permission to access this page.")
         return redirect('index')
 
-    # Get all eLab tests
-    elab_tests = eLabSchedule.objects.all()
-
-    # Handle POST (uploading report)
+    # Handle POST (bulk ZIP or single report upload); back to the same filtered page
     if request.method == 'POST':
+        if 'reports_zip' in request.FILES:
+            try:
+                updated = lab_reports.import_reports(request.FILES['reports_zip'],
+                                                     verify=bool(request.POST.get('report_verified')))
+            except lab_reports.ReportArchiveError as exc:
+                messages.error(request, "Nothing was uploaded: " + "; ".join(exc.problems[:10])
+                               + (f" (and {len(exc.problems) - 10} more)" if len(exc.problems) > 10 else ""))
+            else:
+                messages.success(request, f"Uploaded {len(updated)} report{'s' if len(updated) != 1 else ''}.")
+            return redirect(request.get_full_path())
+
         test_id = request.POST.get('test_id')
         try:
             test = eLabSchedule.objects.get(id=test_id)
-        except eLabSchedule.DoesNotExist:
+        except (eLabSchedule.DoesNotExist, ValueError):
             messages.error(request, "Test not found.")
-            return redirect('doctor_elab_list')
+            return redirect(request.get_full_path())
 
         form = eLabReportUploadForm(request.POST, request.FILES, instance=test)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                test = form.save()
+                if 'report_file' in request.FILES:
+                    notifications.elab_report_uploaded(test)
             messages.success(request, f"Report for {test.test_name} updated successfully.")
-            return redirect('doctor_elab_list')
+            return redirect(request.get_full_path())
         else:
-            messages.error(request, "Failed to upload report. Check your inputs.")
+            problems = [error for errors in form.errors.values() for error in errors]
+            messages.error(request, "Failed to upload report: " + " ".join(problems))
     else:
         form = eLabReportUploadForm()  # empty form
 
+    # Filters: one day (today unless ?date=all), paid, verified, test type.
+    # Each has an index led by the filtered column and followed by the date.
+    date_param = request.GET.get('date', '')
+    day = None if date_param == 'all' else (_parse_date(date_param) or timezone.localdate())
+    filters = {
+        'date': date_param if date_param == 'all' else (day.isoformat() if day else ''),
+        'paid': request.GET.get('paid', ''),
+        'verified': request.GET.get('verified', ''),
+        'test_type': request.GET.get('test_type', ''),
+    }
+    tests, by_type = queries.lab_bookings(filters, day)
+    page = Paginator(tests, ELAB_CONSOLE_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    # Per-day counters for the fortnight around the selected day, one GROUP BY
+    anchor = day or timezone.localdate()
+    window = [anchor + timedelta(days=offset) for offset in range(-3, 11)]
+    counts = {row['preferred_date']: row for row in queries.lab_day_counts(by_type, window[0], window[-1])}
+    empty = {'total': 0, 'paid': 0, 'reported': 0, 'verified': 0}
+    day_counters = [{'day': d, 'selected': d == day, **{k: counts.get(d, empty)[k] for k in empty}}
+                    for d in window]
+
     return render(request, 'main/doctor_elab_list.html', {
-        'elab_tests': elab_tests,
-        'form': form
+        'elab_tests': page,
+        'page_obj': page,
+        'form': form,
+        'filters': filters,
+        'day_counters': day_counters,
+        'test_types': eLabSchedule.TEST_TYPE_CHOICES,
+        'max_reports': settings.ELAB_BULK_MAX_REPORTS,
     })
 
 from django.shortcuts import render, get_object_or_404, redirect
@@ -880,3 +1149,69 @@ def pay_elab(request, test_id):
         return redirect("elab_schedule")  # Shows updated schedule list
 
     return render(request, "main/pay_elab.html", {"test": test})
+
+
+# -------------------- PROTECTED MEDIA --------------------
+
+from django.http import Http404
+from .media import PROTECTED_MEDIA_DIRS, serve_media_file
+
+
+def _can_access_media(user, path):
+    if user.is_staff:
+        return True
+    is_doctor = hasattr(user, 'doctor_profile')
+    folder = path.split('/', 1)[0]
+
+    if folder == 'prescriptions':
+        return is_doctor or Prescription.objects.filter(image=path, patient=user).exists()
+    if folder == 'appointment_prescriptions':
+        return Appointment.objects.filter(
+            Q(patient=user) | Q(doctor__user=user), prescription_file=path
+        ).exists()
+    if folder == 'elab_reports':
+        return is_doctor or eLabSchedule.objects.filter(report_file=path, user=user).exists()
+    return False
+
+
+@login_required
+def protected_media(request, path):
+    if path.split('/', 1)[0] not in PROTECTED_MEDIA_DIRS or not _can_access_media(request.user, path):
+        raise Http404("File not found.")
+    return serve_media_file(request, path)
+
+
+# -------------------- CALENDAR FEEDS --------------------
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_POST
+from .ical import feed_etag, feed_querysets, stream_feed
+from .models import CalendarFeed
+
+
+def calendar_feed(request, token):
+    # No login: calendar apps authenticate with the secret token in the URL
+    feed = get_object_or_404(CalendarFeed.objects.select_related('user__doctor_profile'), token=token)
+    querysets = feed_querysets(feed.user)
+
+    etag = quote_etag(feed_etag(querysets))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = StreamingHttpResponse(stream_feed(querysets, 'MediMart'),
+                                     content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = 'inline; filename="medimart.ics"'
+    return response
+
+
+@login_required
+@require_POST
+def regenerate_calendar_feed(request):
+    CalendarFeed.for_user(request.user).regenerate()
+    messages.success(request, "New calendar link created. Old subscriptions will stop updating.")
+    return redirect('doctor_appointments' if hasattr(request.user, 'doctor_profile') else 'patient_dashboard')
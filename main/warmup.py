@@ -0,0 +1,118 @@
+# main/warmup.py
+"""
+Process warm-up run from medimart5/wsgi.py and asgi.py.
+
+Workers on PythonAnywhere-style hosts are recycled often, and the first
+request after a restart used to pay for building the URL resolver,
+compiling every template, opening the database connection (when
+connections persist) and loading the search indexes. warm_up() does that
+work at startup instead and logs how long import and warm-up took; the
+first request served afterwards is logged too, so time to first byte
+after a restart can be tracked.
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger('medimart.startup')
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates' / 'main'
+
+
+def _timed(timings, name, func):
+    start = time.perf_counter()
+    result = func()
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def compile_templates():
+    """Load every main/ template so the cached loader holds it compiled."""
+    engine = engines['django']
+    compiled = 0
+    for path in sorted(TEMPLATE_DIR.glob('*.html')):
+        try:
+            engine.get_template(f'main/{path.name}')
+        except TemplateSyntaxError:
+            # Same error the page would raise; report it, keep the worker up
+            logger.exception("template main/%s failed to compile", path.name)
+        else:
+            compiled += 1
+    return compiled
+
+
+def populate_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict  # builds the reverse lookup tables
+    resolver.resolve('/')
+    return len(resolver.url_patterns)
+
+
+def open_database():
+    """
+    Open the default connection so the first request reuses it. Only worth
+    it with persistent connections (CONN_MAX_AGE > 0): otherwise the first
+    request_started closes it again. Connections are per thread, so this
+    only helps servers that handle requests on the thread that imported the
+    app (sync WSGI workers), not ASGI or threaded servers.
+    """
+    connection = connections['default']
+    if not connection.settings_dict['CONN_MAX_AGE']:
+        return False
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        logger.exception("database connection not opened at startup")
+        return False
+    return True
+
+
+def build_search_indexes():
+    from .fuzzy import index as fuzzy_index
+    from .suggest import index as suggest_index
+    try:
+        suggest_index.rebuild()
+        fuzzy_index.rebuild()
+    except DatabaseError:
+        # Not migrated yet or unreachable; keep the worker up; the indexes
+        # are built on their first lookup instead
+        logger.exception("search indexes not built at startup")
+
+
+def warm_up(process_started=None):
+    """Warm the process; ``process_started`` is a perf_counter() from wsgi/asgi import."""
+    if os.environ.get('MEDIMART_WARMUP', '1') == '0':
+        return {}
+
+    timings = {}
+    template_count = _timed(timings, 'templates', compile_templates)
+    _timed(timings, 'urls', populate_urls)
+    db_opened = _timed(timings, 'database', open_database)
+    _timed(timings, 'search', build_search_indexes)
+
+    ready = time.perf_counter()
+    if process_started is not None:
+        timings['startup_total'] = ready - process_started
+
+    logger.info(
+        "warm-up done: %d templates in %.1f ms, urls %.1f ms, db %s, "
+        "search indexes %.1f ms, startup %.1f ms",
+        template_count, timings['templates'] * 1000, timings['urls'] * 1000,
+        f"{timings['database'] * 1000:.1f} ms" if db_opened else "skipped (CONN_MAX_AGE=0)",
+        timings['search'] * 1000, timings.get('startup_total', 0) * 1000,
+    )
+
+    def first_request_done(**kwargs):
+        request_finished.disconnect(first_request_done, dispatch_uid='medimart.first_request')
+        logger.info("first request finished %.1f ms after startup",
+                    (time.perf_counter() - (process_started or ready)) * 1000)
+
+    request_finished.connect(first_request_done, dispatch_uid='medimart.first_request', weak=False)
+    return timings
@@ -8,9 +8,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
+
+_process_started = time.perf_counter()
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medimart5.settings')
 
 application = get_asgi_application()
+
+# Compile templates, build the URL resolver and search indexes before the first request
+from main.warmup import warm_up  # noqa: E402
+
+warm_up(_process_started)
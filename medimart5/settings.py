@@ -56,14 +56,22 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         # Look for templates inside a project-level "templates" folder
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process (filled
+            # at startup by main.warmup)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'main.context_processors.cart_count',
                 'main.context_processors.user_group_flags',
+                'main.context_processors.fragment_cache',
             ],
         },
     },
@@ -81,6 +89,79 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: enable with MEDIMART_DB_PROFILE=production.
+# WAL lets readers run alongside the single writer, IMMEDIATE transactions
+# take the write lock up front (so busy_timeout can wait for it instead of
+# failing with "database is locked"), and connections are kept open.
+DB_PROFILE = os.environ.get('MEDIMART_DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,          # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,        # 256 MiB
+    'cache_size': -65536,          # 64 MiB (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        'PRAGMAS': SQLITE_PRODUCTION_PRAGMAS,
+    })
+
+    # Optional read replica refreshed with `manage.py sync_replica`
+    if os.environ.get('MEDIMART_DB_REPLICA'):
+        # Not kept open: sync_replica swaps in a new file, and a persistent
+        # connection would keep reading the old, unlinked one.
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['MEDIMART_DB_REPLICA'],
+            'CONN_MAX_AGE': 0,
+            'PRAGMAS': {
+                'mmap_size': SQLITE_PRODUCTION_PRAGMAS['mmap_size'],
+                'cache_size': SQLITE_PRODUCTION_PRAGMAS['cache_size'],
+                'query_only': 'ON',
+            },
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_ROUTERS = ['main.db.ReadReplicaRouter']
+
+
+# Cache (template fragments, model version counters)
+# LocMemCache is per process; with several workers set MEDIMART_CACHE_DIR so
+# they share fragments and see each other's invalidations.
+if os.environ.get('MEDIMART_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['MEDIMART_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'medimart',
+        }
+    }
+
+
+# Logging: startup/warm-up timings from main.warmup
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'medimart': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,6 +198,105 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Prescriptions and lab reports are served by main.views.protected_media after
+# a permission check. The web server must NOT expose these MEDIA_ROOT
+# subfolders directly. Set to 'xsendfile' (Apache mod_xsendfile) or 'xaccel'
+# (nginx, with an `internal` location at MEDIA_ACCEL_PREFIX aliased to
+# MEDIA_ROOT) to hand the transfer to the web server; None streams the file
+# from Django.
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIMART_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+
+# Prescription review queue: each doctor leases a batch of pending
+# prescriptions; unfinished leases return to the queue when they expire.
+PRESCRIPTION_CLAIM_BATCH = 10
+PRESCRIPTION_LEASE_MINUTES = 15
+
+
+# Delivered/cancelled orders older than this move to the archive tables
+# (manage.py archive_orders).
+ORDER_ARCHIVE_AFTER_DAYS = 180
+
+
+# Carts untouched for this long are deleted by manage.py gc_carts; empty
+# carts go sooner.
+CART_ABANDON_AFTER_DAYS = 30
+EMPTY_CART_AFTER_DAYS = 1
+
+# Login/signup POSTs allowed per bucket: (burst, seconds to refill fully),
+# keyed by client IP and by submitted username + IP (main/throttle.py).
+AUTH_THROTTLE_RATES = {
+    'login': {'ip': (30, 300), 'user': (5, 300)},
+    'signup': {'ip': (5, 3600), 'user': (3, 3600)},
+}
+# Request header carrying the real client IP behind a proxy, e.g.
+# 'HTTP_X_REAL_IP' on PythonAnywhere; None uses REMOTE_ADDR. For a
+# comma-separated header (X-Forwarded-For) the client is the entry
+# THROTTLE_TRUSTED_PROXIES places from the right: the number of proxies in
+# front of Django that append to it.
+THROTTLE_CLIENT_IP_HEADER = os.environ.get('MEDIMART_CLIENT_IP_HEADER') or None
+THROTTLE_TRUSTED_PROXIES = int(os.environ.get('MEDIMART_TRUSTED_PROXIES', 1))
+
+
+# Minutes the checkout page holds a cart's stock; lapsed holds are deleted
+# by manage.py release_stock_holds.
+STOCK_HOLD_MINUTES = 10
+
+# Record sales as StockMovement ledger rows folded in by
+# manage.py compact_stock_ledger (MEDIMART_STOCK_LEDGER=1) instead of
+# decrementing the stock column in place. Off by default: each order's
+# availability check has to sum the uncompacted movements, and SQLite has
+# one write lock anyway (benchmarks/stock_ledger.py, 8 writers: about 1.6k-2.5k
+# orders/s with the ledger vs 22k in place). The ledger's check takes no row
+# lock and relies on that single write lock, so it is for SQLite only.
+STOCK_LEDGER = os.environ.get('MEDIMART_STOCK_LEDGER') == '1'
+
+# "Frequently bought together": neighbours stored per SKU by
+# manage.py build_recommendations, and how many are shown on a page.
+RECOMMENDATIONS_PER_SKU = 10
+RECOMMENDATIONS_SHOWN = 4
+
+# Bulk eLab report upload (ZIP of <booking id>.pdf files) on the lab console.
+ELAB_BULK_MAX_REPORTS = 500
+ELAB_REPORT_MAX_BYTES = 20 * 1024 * 1024
+
+# Uploads (main/uploads.py): files over the byte limit stop being buffered
+# mid-stream; images over UPLOAD_MAX_PIXELS are rejected from their header,
+# the rest re-encoded as metadata-free JPEGs on UPLOAD_WORKERS threads.
+FILE_UPLOAD_HANDLERS = [
+    'main.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+# The lab console's bulk report ZIP is spooled to a temporary file, not memory
+UPLOAD_FIELD_MAX_BYTES = {'reports_zip': 500 * 1024 * 1024}
+UPLOAD_MAX_PIXELS = 40_000_000
+UPLOAD_IMAGE_MAX_DIMENSION = 2048
+UPLOAD_IMAGE_QUALITY = 85
+UPLOAD_WORKERS = 2
+
+# Outgoing mail for manage.py send_notifications. Set MEDIMART_EMAIL_HOST to
+# send through SMTP; otherwise digests are written to MEDIMART_EMAIL_FILE_PATH
+# if set, else printed to the console.
+if os.environ.get('MEDIMART_EMAIL_HOST'):
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_HOST = os.environ['MEDIMART_EMAIL_HOST']
+    EMAIL_PORT = int(os.environ.get('MEDIMART_EMAIL_PORT', 587))
+    EMAIL_HOST_USER = os.environ.get('MEDIMART_EMAIL_USER', '')
+    EMAIL_HOST_PASSWORD = os.environ.get('MEDIMART_EMAIL_PASSWORD', '')
+    EMAIL_USE_TLS = True
+elif os.environ.get('MEDIMART_EMAIL_FILE_PATH'):
+    EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+    EMAIL_FILE_PATH = os.environ['MEDIMART_EMAIL_FILE_PATH']
+else:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = os.environ.get('MEDIMART_FROM_EMAIL', 'MediMart <no-reply@medimart.com>')
+
+# A notification whose digest failed this many times is left unsent
+NOTIFICATION_MAX_ATTEMPTS = 5
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field